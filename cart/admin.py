@@ -1,6 +1,6 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Shop, Customer, Product, Coupon, Purchase, PurchaseProduct, PaymentGateway, PaymentMethod, Payment, Address, GatewayPaymentMethod, ShopPaymentMethod
+from .models import Shop, Customer, Product, Coupon, Purchase, PurchaseProduct, PaymentGateway, PaymentMethod, Payment, Address, GatewayPaymentMethod, ShopPaymentMethod, StockReservation, CouponRedemption, PaymentWebhookEvent, ArchivedPurchase, ArchivedPurchaseProduct, ArchivedPayment
 
-admin.site.register([Shop, Customer, Product, Coupon, Purchase, PurchaseProduct, PaymentGateway, PaymentMethod, GatewayPaymentMethod, ShopPaymentMethod, Payment, Address])
+admin.site.register([Shop, Customer, Product, Coupon, Purchase, PurchaseProduct, PaymentGateway, PaymentMethod, GatewayPaymentMethod, ShopPaymentMethod, Payment, Address, StockReservation, CouponRedemption, PaymentWebhookEvent, ArchivedPurchase, ArchivedPurchaseProduct, ArchivedPayment])
@@ -6,3 +6,5 @@ class CartConfig(AppConfig):
 
     def ready(self):
         import cart.signals  # ensures signal handlers are loaded
+        from cart.services.payments_service.loader import load_gateway_classes
+        load_gateway_classes()  # resolve gateway classes once at startup
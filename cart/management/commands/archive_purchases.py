@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from cart.services.archive_service import archive_completed
+
+class Command(BaseCommand):
+    help = "Moves delivered and cancelled purchases older than PURCHASE_ARCHIVE_AFTER, with their lines, to the archive tables in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        last_id = 0
+        purchases = lines = 0
+        while True:
+            last_id, moved, moved_lines = archive_completed(last_id, options["batch_size"])
+            if last_id is None:
+                break
+            purchases += moved
+            lines += moved_lines
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Archived purchases up to #{last_id}: {moved} purchases, {moved_lines} lines")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        elapsed = time.monotonic() - started
+        rows = purchases + lines
+        self.stdout.write(self.style.SUCCESS(
+            f"{purchases} purchases and {lines} lines archived in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
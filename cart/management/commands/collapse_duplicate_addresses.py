@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from cart.services.addresses_service import fill_fingerprints, collapse_duplicates
+
+class Command(BaseCommand):
+    help = "Fingerprints existing addresses and merges each customer's duplicate addresses, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        for step, label in ((fill_fingerprints, "addresses fingerprinted"), (collapse_duplicates, "duplicate addresses removed")):
+            total = 0
+            while True:
+                done = step(options["batch_size"])
+                total += done
+                if not done:
+                    break
+                if options["sleep"]:
+                    time.sleep(options["sleep"])
+            self.stdout.write(self.style.SUCCESS(f"{total} {label}."))
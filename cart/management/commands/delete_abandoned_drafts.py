@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from cart.services.purchases_service import delete_abandoned_drafts
+
+class Command(BaseCommand):
+    help = "Deletes draft purchases older than DRAFT_PURCHASE_TTL, with their lines, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        last_id = 0
+        totals = {}
+        while True:
+            last_id, deleted = delete_abandoned_drafts(last_id, options["batch_size"])
+            if last_id is None:
+                break
+            for label, count in deleted.items():
+                totals[label] = totals.get(label, 0) + count
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Deleted drafts up to #{last_id}: {deleted}")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        elapsed = time.monotonic() - started
+        rows = sum(totals.values())
+        for label, count in sorted(totals.items()):
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals.get('cart.Purchase', 0)} abandoned drafts deleted, {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
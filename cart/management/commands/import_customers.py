@@ -0,0 +1,27 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from cart.models import Shop
+from cart.services.customers_service import bulk_upsert
+
+class Command(BaseCommand):
+    help = "Creates or updates a shop's customers from a CSV file with name, email and phone columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument("domain", help="Domain of the shop the customers belong to")
+        parser.add_argument("path", help="CSV file with a header row")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        shop = Shop.objects.filter(domain=options["domain"]).first()
+        if shop is None:
+            raise CommandError(f"No shop with domain {options['domain']}.")
+
+        with open(options["path"], newline="") as file:
+            rows = [
+                {"name": row["name"], "email": row["email"], "phone": row["phone"]}
+                for row in csv.DictReader(file)
+            ]
+        counts = bulk_upsert(shop, rows, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['created']} customers created, {counts['updated']} updated, {counts['unchanged']} unchanged."
+        ))
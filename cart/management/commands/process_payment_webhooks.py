@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from cart.services.webhooks_service import process_pending, needs_review_count
+
+class Command(BaseCommand):
+    help = "Processes stored payment webhooks in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new webhooks")
+        parser.add_argument("--sleep", type=float, default=1, help="Seconds to wait when the inbox is empty (with --loop)")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_pending(options["batch_size"])
+            total += processed
+            if processed < options["batch_size"]:
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} webhooks processed."))
+        needs_review = needs_review_count()
+        if needs_review:
+            self.stdout.write(self.style.WARNING(f"{needs_review} paid payments need review (purchase could not be activated)."))
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from cart.services.idempotency_service import purge_expired
+
+class Command(BaseCommand):
+    help = "Deletes expired Idempotency-Key records in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            deleted = purge_expired(options["batch_size"])
+            total += deleted
+            if deleted < options["batch_size"]:
+                break
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} expired idempotency keys purged."))
@@ -1,21 +1,66 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
 from cart.models import (
     Shop, Product, Coupon, Customer, Address,
     PaymentGateway, PaymentMethod,
-    GatewayPaymentMethod, ShopPaymentMethod
+    GatewayPaymentMethod, ShopPaymentMethod,
+    Purchase, PurchaseProduct, Payment, StockReservation, CouponRedemption,
+    PaymentWebhookEvent, IdempotencyKey, ArchivedPurchase, ArchivedPurchaseProduct, ArchivedPayment
 )
 
+# children first, so rows can be removed without loading them for cascades
+SEEDED_MODELS = [
+    IdempotencyKey, PaymentWebhookEvent, CouponRedemption, StockReservation, Payment,
+    ArchivedPayment, ArchivedPurchaseProduct, ArchivedPurchase, PurchaseProduct, Purchase, Address, Customer,
+    Coupon, Product, ShopPaymentMethod, GatewayPaymentMethod, PaymentGateway, PaymentMethod, Shop,
+]
+
+FIRST_NAMES = ["Ahmed", "Sara", "Omar", "Nour", "Youssef", "Laila", "Karim", "Mona", "Hassan", "Farah", "Ali", "Huda"]
+LAST_NAMES = ["Hassan", "Eraky", "Mahmoud", "Saleh", "Fahmy", "Nasser", "Kamal", "Adel", "Zaki", "Farouk"]
+CITIES = [("Cairo", "Cairo"), ("Giza", "Giza"), ("Alexandria", "Alexandria"), ("Riyadh", "Riyadh"), ("Jeddah", "Makkah")]
+PRODUCT_NAMES = ["T-shirt", "Dress", "Skirt", "Jacket", "Sneakers", "Scarf", "Hoodie", "Jeans", "Bag", "Watch"]
+PURCHASE_STATUSES = ["draft", "active", "shipped", "delivered", "cancelled"]
+PURCHASE_STATUS_WEIGHTS = [30, 10, 10, 40, 10]
+
+
+@contextmanager
+def without_auto_now_add(model, field_name):
+    """Lets generated rows keep their own (spread out) creation dates."""
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def fingerprinted(address):
+    """Bulk inserts skip Address.save, which sets the fingerprint."""
+    address.fingerprint = Address.fingerprint_for(address.__dict__)
+    return address
+
+
 class Command(BaseCommand):
     help = "Seeds the database with initial data for testing and development"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--shops", type=int, default=0, help="Number of generated shops (on top of the demo shop)")
+        parser.add_argument("--products-per-shop", type=int, default=100)
+        parser.add_argument("--customers", type=int, default=1000, help="Customers per generated shop")
+        parser.add_argument("--purchases", type=int, default=1000, help="Purchases per generated shop")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, the same seed generates the same data")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
     def handle(self, *args, **options):
         # Delete old data
-        Shop.objects.all().delete()
-        Customer.objects.all().delete()
-        Product.objects.all().delete()
-        Coupon.objects.all().delete()
-        PaymentGateway.objects.all().delete()
-        PaymentMethod.objects.all().delete()
+        for model in SEEDED_MODELS:
+            model._base_manager.all()._raw_delete(model._base_manager.db)
 
         # Create a shop
         shop = Shop.objects.create(name="Demo Shop", domain="demo-shop.com")
@@ -28,7 +73,6 @@ class Command(BaseCommand):
         # Create an Address
         Address.objects.create(
             customer=customer,
-            shop=shop,
             line1="1 street",
             line2="Apartment 2",
             city="Cairo",
@@ -47,7 +91,7 @@ class Command(BaseCommand):
         coupon = Coupon.objects.create(
             shop=shop,
             code="FIRST10",
-            discount_type="percentage",
+            discount_type="percent",
             discount_value=10,
             min_cart_value=300,
             is_active=True,
@@ -72,3 +116,134 @@ class Command(BaseCommand):
         ShopPaymentMethod.objects.create(shop=shop, gateway_payment_method=gateway_cash, config={}, is_active=True)
 
         self.stdout.write(self.style.SUCCESS("data created successfully!"))
+
+        if options["shops"]:
+            self.generate(options, [gateway_card, gateway_cash])
+
+    def generate(self, options, gateway_payment_methods):
+        """
+        Generates production sized tables with batched inserts.
+        All randomness comes from --seed so runs are reproducible.
+        """
+        rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        now = timezone.now()
+
+        for shop_index in range(options["shops"]):
+            with transaction.atomic():
+                shop = Shop.objects.create(name=f"Shop {shop_index}", domain=f"shop-{shop_index}.example.com")
+                shop_payment_methods = self.insert(ShopPaymentMethod, [
+                    ShopPaymentMethod(shop=shop, gateway_payment_method=gpm, config={})
+                    for gpm in gateway_payment_methods
+                ])
+                self.insert(Coupon, [
+                    Coupon(
+                        shop=shop, code=f"SAVE{value}", discount_type=rng.choice(["percent", "fixed"]),
+                        discount_value=value, min_cart_value=rng.choice([0, 100, 300]),
+                        once_per_customer=rng.random() < 0.3,
+                    )
+                    for value in (5, 10, 15, 20, 25)
+                ])
+
+                products = self.insert(Product, (
+                    Product(
+                        shop=shop,
+                        name=f"{rng.choice(PRODUCT_NAMES)} {i}",
+                        sku=f"S{shop_index}-P{i}",
+                        price=Decimal(rng.randint(1000, 200000)) / 100,
+                        stock=rng.randint(0, 500),
+                        is_active=rng.random() < 0.95,
+                    )
+                    for i in range(options["products_per_shop"])
+                ))
+
+                customers = self.insert(Customer, (
+                    Customer(
+                        shop=shop,
+                        name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                        email=f"customer{i}.shop{shop_index}@example.com",
+                        phone=f"01{rng.randint(0, 999999999):09d}",
+                    )
+                    for i in range(options["customers"])
+                ))
+
+                addresses = self.insert(Address, (
+                    fingerprinted(Address(
+                        customer=customer,
+                        line1=f"{rng.randint(1, 300)} {rng.choice(LAST_NAMES)} St",
+                        city=city,
+                        region=region,
+                        country="Egypt" if city in ("Cairo", "Giza", "Alexandria") else "Saudi Arabia",
+                        postal_code=f"{rng.randint(10000, 99999)}",
+                        is_default=index == 0,
+                    ))
+                    for customer in customers
+                    for index, (city, region) in enumerate(rng.sample(CITIES, rng.randint(1, 3)))
+                ))
+                addresses_by_customer = {}
+                for address in addresses:
+                    addresses_by_customer.setdefault(address.customer_id, address)
+
+                self.generate_purchases(rng, options["purchases"], shop, products, customers, addresses_by_customer, shop_payment_methods, now)
+
+    def generate_purchases(self, rng, count, shop, products, customers, addresses_by_customer, shop_payment_methods, now):
+        for start in range(0, count, self.batch_size):
+            purchases = []
+            lines = []
+            for _ in range(min(self.batch_size, count - start)):
+                status = rng.choices(PURCHASE_STATUSES, PURCHASE_STATUS_WEIGHTS)[0]
+                # drafts are often anonymous carts
+                customer = None if status == "draft" and rng.random() < 0.5 else rng.choice(customers)
+                cart = [
+                    PurchaseProduct(product=product, quantity=rng.randint(1, 3), price_at_purchase=product.price)
+                    for product in rng.sample(products, min(len(products), rng.randint(1, 5)))
+                ]
+                created_at = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+                subtotal = sum(line.quantity * line.price_at_purchase for line in cart)
+                purchases.append(Purchase(
+                    shop=shop,
+                    customer=customer,
+                    address=addresses_by_customer.get(customer.id) if customer else None,
+                    status=status,
+                    total_amount=subtotal,
+                    subtotal=subtotal,
+                    item_count=sum(line.quantity for line in cart),
+                    created_at=created_at,
+                ))
+                lines.append(cart)
+
+            with without_auto_now_add(Purchase, "created_at"):
+                purchases = self.insert(Purchase, purchases)
+
+            purchase_products = []
+            payments = []
+            for purchase, cart in zip(purchases, lines):
+                for line in cart:
+                    line.purchase = purchase
+                    purchase_products.append(line)
+                if purchase.status != "draft":
+                    payments.append(Payment(
+                        purchase=purchase,
+                        shop_payment_method=rng.choice(shop_payment_methods),
+                        status="failed" if purchase.status == "cancelled" else "paid",
+                        transaction_reference=f"txn_{purchase.id}",
+                    ))
+            self.insert(PurchaseProduct, purchase_products)
+            self.insert(Payment, payments)
+
+    def insert(self, model, objs):
+        """Inserts rows in batches and reports the insert rate."""
+        created = []
+        batch = []
+        started = time.monotonic()
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                created.extend(model.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            created.extend(model.objects.bulk_create(batch))
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f"{model.__name__}: {len(created)} rows ({len(created) / elapsed:.0f} rows/sec)")
+        return created
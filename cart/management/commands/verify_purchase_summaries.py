@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from cart.services.totals_service import verify_summaries
+
+class Command(BaseCommand):
+    help = "Checks the purchase subtotal, discount, item count and total columns against a full recompute of their lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--fix", action="store_true", help="Recompute the purchases that do not match")
+
+    def handle(self, *args, **options):
+        last_id = 0
+        mismatched = []
+        while True:
+            last_id, batch = verify_summaries(last_id, options["batch_size"], fix=options["fix"])
+            if last_id is None:
+                break
+            mismatched += batch
+
+        for purchase_id in mismatched:
+            self.stdout.write(f"Purchase #{purchase_id} summary does not match its lines.")
+        if mismatched and not options["fix"]:
+            self.stdout.write(self.style.ERROR(f"{len(mismatched)} purchase summaries do not match."))
+        elif mismatched:
+            self.stdout.write(self.style.SUCCESS(f"{len(mismatched)} purchase summaries recomputed."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All purchase summaries match."))
@@ -0,0 +1,233 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+# request latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# (route, method) -> aggregated values of this process
+_routes = {}
+_lock = threading.Lock()
+# one flush at a time per process, _last_flush is read and set under it
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+# timings of the request being handled: {"db_queries", "db_time", "serialization"}
+_current = ContextVar("request_metrics", default=None)
+
+
+def _empty():
+    return {
+        "requests": 0,
+        "statuses": {},
+        "buckets": [0] * len(BUCKETS),
+        "duration": 0.0,
+        "db_queries": 0,
+        "db_time": 0.0,
+        "serialization": 0.0,
+    }
+
+
+@contextmanager
+def track_request():
+    """Collects the DB and serialization timings made inside the block, yields them."""
+    timings = {"db_queries": 0, "db_time": 0.0, "serialization": 0.0}
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """Adds the time spent in the block to the current request's timing of that name."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] += time.perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing the queries of the current request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings["db_queries"] += 1
+        timings["db_time"] += time.perf_counter() - started
+
+
+def instrument(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def observe(route, method, status, duration, timings):
+    """Adds one finished request to this process' aggregates."""
+    with _lock:
+        values = _routes.setdefault((route, method), _empty())
+        values["requests"] += 1
+        values["statuses"][str(status)] = values["statuses"].get(str(status), 0) + 1
+        for index, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                values["buckets"][index] += 1
+                break
+        values["duration"] += duration
+        values["db_queries"] += timings["db_queries"]
+        values["db_time"] += timings["db_time"]
+        values["serialization"] += timings["serialization"]
+    _maybe_flush()
+
+
+def _process_file(pid=None):
+    return os.path.join(settings.METRICS_DIR, f"{pid or os.getpid()}.json")
+
+
+def _maybe_flush(force=False):
+    """
+    With METRICS_DIR set every worker process writes its aggregates to its own file
+    (at most every METRICS_FLUSH_INTERVAL seconds), the metrics endpoint sums all files.
+    Write errors are dropped, the next flush retries: metrics never fail a request.
+    """
+    global _last_flush
+    if not settings.METRICS_DIR:
+        return
+    # a request finding a flush in progress leaves it to that one
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        now = time.monotonic()
+        if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        _last_flush = now
+        with _lock:
+            snapshot = json.dumps([[route, method, values] for (route, method), values in _routes.items()])
+        _write(_process_file(), snapshot)
+    except OSError:
+        pass
+    finally:
+        _flush_lock.release()
+
+
+def _write(path, content):
+    # written next to the target and renamed over it, readers never see a partial file
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), suffix=".tmp", delete=False) as file:
+        file.write(content)
+    try:
+        os.replace(file.name, path)
+    except OSError:
+        os.remove(file.name)
+        raise
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # exists, owned by another user
+        return True
+    return True
+
+
+def _merge(into, values):
+    into["requests"] += values["requests"]
+    for status, count in values["statuses"].items():
+        into["statuses"][status] = into["statuses"].get(status, 0) + count
+    into["buckets"] = [a + b for a, b in zip(into["buckets"], values["buckets"])]
+    for name in ("duration", "db_queries", "db_time", "serialization"):
+        into[name] += values[name]
+
+
+def collect():
+    """Aggregates of every worker process (or only this one without METRICS_DIR)."""
+    merged = {}
+    if settings.METRICS_DIR:
+        _maybe_flush(force=True)
+        for name in sorted(os.listdir(settings.METRICS_DIR)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(settings.METRICS_DIR, name)
+            pid = name.removesuffix(".json")
+            if pid.isdigit() and not _alive(int(pid)):
+                # left by a worker that exited, its counters go with it
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for route, method, values in snapshot:
+                _merge(merged.setdefault((route, method), _empty()), values)
+    else:
+        with _lock:
+            for key, values in _routes.items():
+                _merge(merged.setdefault(key, _empty()), values)
+    return merged
+
+
+def render():
+    """Prometheus text exposition of the collected aggregates."""
+    routes = sorted(collect().items())
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+
+    def labels(route, method, **extra):
+        pairs = {"route": route, "method": method, **extra}
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs.items()) + "}"
+
+    metric("cart_http_requests_total", "counter", "Handled requests.", [
+        f"cart_http_requests_total{labels(route, method, status=status)} {count}"
+        for (route, method), values in routes
+        for status, count in sorted(values["statuses"].items())
+    ])
+
+    samples = []
+    for (route, method), values in routes:
+        cumulative = 0
+        for bound, count in zip(BUCKETS, values["buckets"]):
+            cumulative += count
+            samples.append(f"cart_http_request_duration_seconds_bucket{labels(route, method, le=bound)} {cumulative}")
+        samples.append(f'cart_http_request_duration_seconds_bucket{labels(route, method, le="+Inf")} {values["requests"]}')
+        samples.append(f"cart_http_request_duration_seconds_sum{labels(route, method)} {values['duration']:.6f}")
+        samples.append(f"cart_http_request_duration_seconds_count{labels(route, method)} {values['requests']}")
+    metric("cart_http_request_duration_seconds", "histogram", "Request latency.", samples)
+
+    metric("cart_db_queries_total", "counter", "Database queries made by requests.", [
+        f"cart_db_queries_total{labels(route, method)} {values['db_queries']}" for (route, method), values in routes
+    ])
+    metric("cart_db_query_duration_seconds_total", "counter", "Time requests spent in database queries.", [
+        f"cart_db_query_duration_seconds_total{labels(route, method)} {values['db_time']:.6f}" for (route, method), values in routes
+    ])
+    metric("cart_serialization_duration_seconds_total", "counter", "Time requests spent serializing responses.", [
+        f"cart_serialization_duration_seconds_total{labels(route, method)} {values['serialization']:.6f}" for (route, method), values in routes
+    ])
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _routes.clear()
@@ -1,20 +1,129 @@
-from cart.models import Shop
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from cart import metrics
+from cart.routers import reads_from_replicas, replicas
+from cart.services.shops_service import get_by_domain, aget_by_domain
+from django.conf import settings
 from django.http import Http404
 
+# served without a shop
+SHOPLESS_PATHS = ("/admin/", "/metrics")
+
 class CurrentShopMiddleware:
     """Attach current Shop to request based on domain"""
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        if request.path.startswith("/admin/"):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if request.path.startswith(SHOPLESS_PATHS):
             return self.get_response(request)
             
         # remove port if found
         host = request.get_host().split(':')[0]
-        try:
-            request.shop = Shop.objects.get(domain=host)
-        except Shop.DoesNotExist:
+        # resolved through an in-process cache, unknown hosts are cached too
+        request.shop = get_by_domain(host)
+        if request.shop is None:
             raise Http404("Shop not found for this domain")
         response = self.get_response(request)
         return response
+
+    async def __acall__(self, request):
+        if request.path.startswith(SHOPLESS_PATHS):
+            return await self.get_response(request)
+
+        host = request.get_host().split(':')[0]
+        request.shop = await aget_by_domain(host)
+        if request.shop is None:
+            raise Http404("Shop not found for this domain")
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serves safe requests from the read replicas and everything else from the primary.
+    A client that made a write is pinned to the primary for REPLICA_STICKINESS_SECONDS (through a cookie),
+    so it never reads its own cart from a replica that has not caught up yet.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = "primary_db_until"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with reads_from_replicas(self.use_replicas(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        with reads_from_replicas(self.use_replicas(request)):
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+    def use_replicas(self, request):
+        if not replicas() or request.method not in ("GET", "HEAD", "OPTIONS"):
+            return False
+        try:
+            pinned_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            pinned_until = 0
+        return pinned_until <= time.time()
+
+    def pin(self, request, response):
+        if replicas() and request.method not in ("GET", "HEAD", "OPTIONS"):
+            window = settings.REPLICA_STICKINESS_SECONDS
+            response.set_cookie(
+                self.cookie_name, str(int(time.time() + window)), max_age=window, httponly=True, samesite="Lax"
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records per route (url name, e.g. purchases-activate) and method: request count by status,
+    latency histogram, DB query count and time, and serialization time. Exposed at /metrics.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        started = time.perf_counter()
+        with metrics.track_request() as timings:
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started, timings)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with metrics.track_request() as timings:
+            response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started, timings)
+        return response
+
+    def observe(self, request, response, duration, timings):
+        match = request.resolver_match
+        route = match.url_name if match and match.url_name else "unmatched"
+        if route != "metrics":
+            metrics.observe(route, request.method, response.status_code, duration, timings)
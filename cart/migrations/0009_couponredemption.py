@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_redemptions(apps, schema_editor):
+    Purchase = apps.get_model('cart', 'Purchase')
+    Coupon = apps.get_model('cart', 'Coupon')
+    CouponRedemption = apps.get_model('cart', 'CouponRedemption')
+
+    redeemed = Purchase.objects.filter(
+        coupon__isnull=False, customer__isnull=False, status__in=['active', 'shipped', 'delivered']
+    ).values_list('id', 'coupon_id', 'customer_id', 'coupon__once_per_customer')
+    CouponRedemption.objects.bulk_create(
+        (
+            CouponRedemption(purchase_id=purchase_id, coupon_id=coupon_id, customer_id=customer_id, once_per_customer=once)
+            for purchase_id, coupon_id, customer_id, once in redeemed.iterator()
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    for coupon_id, used in CouponRedemption.objects.values_list('coupon_id').annotate(used=Count('id')):
+        Coupon.objects.filter(pk=coupon_id).update(times_used=used)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0008_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='times_used',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='usage_limit',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CouponRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('once_per_customer', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='cart.coupon')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemptions', to='cart.customer')),
+                ('purchase', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemption', to='cart.purchase')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['coupon', 'customer'], name='cart_coupon_coupon__62504b_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('once_per_customer', True)), fields=('coupon', 'customer'), name='unique_once_per_customer_redemption')],
+            },
+        ),
+        migrations.RunPython(backfill_redemptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0010_paymentwebhookevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['shop', 'created_at'], name='cart_custom_shop_id_752611_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:15
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_summaries(apps, schema_editor):
+    Purchase = apps.get_model('cart', 'Purchase')
+    PurchaseProduct = apps.get_model('cart', 'PurchaseProduct')
+
+    money = DecimalField(max_digits=10, decimal_places=2)
+    lines = PurchaseProduct.objects.filter(purchase=OuterRef('pk')).values('purchase')
+    subtotal = lines.annotate(total=Sum(F('quantity') * F('price_at_purchase'), output_field=money)).values('total')
+    item_count = lines.annotate(total=Sum('quantity')).values('total')
+    Purchase.objects.update(
+        subtotal=Coalesce(Subquery(subtotal, output_field=money), Value(0), output_field=money),
+        item_count=Coalesce(Subquery(item_count, output_field=IntegerField()), Value(0)),
+    )
+    # whatever separates the stored total from the subtotal is the discount that was applied
+    Purchase.objects.update(discount=Greatest(F('subtotal') - F('total_amount'), Value(0), output_field=money))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0011_customer_shop_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='discount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
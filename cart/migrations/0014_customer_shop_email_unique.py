@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:21
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    Customer = apps.get_model('cart', 'Customer')
+    mixed_case = Customer.objects.exclude(email=Lower('email')).annotate(lowered=Lower('email'))
+    for customer in mixed_case.iterator():
+        # a customer that differs only by case already exists in the shop: leave the row for manual merging
+        if Customer.objects.filter(shop_id=customer.shop_id, email=customer.lowered).exists():
+            continue
+        Customer.objects.filter(pk=customer.pk).update(email=customer.lowered)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0013_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='cart_custom_shop_id_7319af_idx',
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='email',
+            field=models.EmailField(max_length=254),
+        ),
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(fields=('shop', 'email'), name='unique_customer_shop_email'),
+        ),
+    ]
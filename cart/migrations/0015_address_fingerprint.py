@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0014_customer_shop_email_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['customer', 'fingerprint'], name='cart_addres_custome_2ac7f2_idx'),
+        ),
+    ]
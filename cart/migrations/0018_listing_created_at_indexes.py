@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0017_purchase_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['customer', 'created_at'], name='cart_addres_custome_5b07de_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseproduct',
+            index=models.Index(fields=['product', 'created_at'], name='cart_purcha_product_4331e1_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_archived_payments(apps, schema_editor):
+    """Rows left pointing at archived purchases must go before their foreign keys are constrained again."""
+    Purchase = apps.get_model('cart', 'Purchase')
+    Payment = apps.get_model('cart', 'Payment')
+    PaymentWebhookEvent = apps.get_model('cart', 'PaymentWebhookEvent')
+    ArchivedPayment = apps.get_model('cart', 'ArchivedPayment')
+    live = Purchase.objects.values('pk')
+    orphaned = Payment.objects.exclude(purchase_id__in=live)
+    ArchivedPayment.objects.bulk_create([
+        ArchivedPayment(
+            id=payment.id, purchase_id=payment.purchase_id, shop_payment_method_id=payment.shop_payment_method_id,
+            status=payment.status, transaction_reference=payment.transaction_reference,
+            created_at=payment.created_at, updated_at=payment.updated_at,
+        )
+        for payment in orphaned.iterator()
+    ], batch_size=1000)
+    orphaned.delete()
+    PaymentWebhookEvent.objects.exclude(purchase_id__in=live).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0018_listing_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('unpaid', 'Unpaid'), ('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed')], max_length=20)),
+                ('transaction_reference', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('purchase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='cart.archivedpurchase')),
+                ('shop_payment_method', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_payments', to='cart.shoppaymentmethod')),
+            ],
+        ),
+        migrations.RunPython(move_archived_payments, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='payment',
+            name='purchase',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='cart.purchase'),
+        ),
+        migrations.AlterField(
+            model_name='paymentwebhookevent',
+            name='purchase',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_events', to='cart.purchase'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0020_payment_needs_review'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='retired',
+            field=models.BooleanField(default=False),
+        ),
+    ]
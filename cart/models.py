@@ -1,9 +1,14 @@
+import hashlib
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
 class Shop(models.Model):
     name = models.CharField(max_length=255)
     domain = models.CharField(max_length=255, unique=True, db_index=True)
+    # bumped on every product change, keys the cached catalog (see catalog_service)
+    catalog_version = models.PositiveIntegerField(default=0)
+    catalog_updated_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -13,19 +18,39 @@ class Shop(models.Model):
 class Customer(models.Model):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="customers")
     name = models.CharField(max_length=255)
-    email = models.EmailField(unique=True)
+    # stored lower cased (normalize_email), on every write path
+    email = models.EmailField()
     phone = models.CharField(max_length=20)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        constraints = [
+            # conflict target of the customer upsert, also serves the (shop, email) lookups
+            models.UniqueConstraint(fields=["shop", "email"], name="unique_customer_shop_email"),
+        ]
         indexes = [
-            models.Index(fields=["shop", "email"]),
+            models.Index(fields=["shop", "created_at"]),
         ]
 
+    @staticmethod
+    def normalize_email(email):
+        """Emails are stored lower cased, so the (shop, email) unique index serves case-insensitive lookups."""
+        return email.strip().lower()
+
+    def save(self, *args, **kwargs):
+        self.email = self.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} ({self.shop.name})"
 
+class AddressManager(models.Manager):
+    """Hides retired addresses, purchases still reach theirs through the base manager."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(retired=False)
+
 class Address(models.Model):
     customer = models.ForeignKey('Customer', on_delete=models.CASCADE, related_name='addresses', db_index=True)
     line1 = models.CharField(max_length=255)
@@ -35,9 +60,38 @@ class Address(models.Model):
     country = models.CharField(max_length=100)
     postal_code = models.CharField(max_length=20, null=True, blank=True)
     is_default = models.BooleanField(default=False)
+    # hash of the normalized address lines, identical addresses of a customer share it
+    fingerprint = models.CharField(max_length=64, blank=True, default="")
+    # copy kept for placed purchases after the customer edited or deleted the address (see addresses_service)
+    retired = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AddressManager()
+
+    FINGERPRINT_FIELDS = ("line1", "line2", "city", "region", "country", "postal_code")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "fingerprint"]),
+            models.Index(fields=["customer", "created_at"]),
+        ]
+
+    @staticmethod
+    def normalize(value):
+        """Trims and collapses whitespace."""
+        return " ".join(str(value).split()) if value is not None else None
+
+    @classmethod
+    def fingerprint_for(cls, values):
+        """Case and whitespace insensitive hash of the address fields in values."""
+        parts = [(cls.normalize(values.get(name)) or "").casefold() for name in cls.FINGERPRINT_FIELDS]
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = self.fingerprint_for({name: getattr(self, name) for name in self.FINGERPRINT_FIELDS})
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.line1}, {self.city}, {self.country}"
 
@@ -70,6 +124,8 @@ class Coupon(models.Model):
     valid_from = models.DateField(null=True, blank=True)
     valid_to = models.DateField(null=True, blank=True)
     once_per_customer = models.BooleanField(default=False)
+    usage_limit = models.PositiveIntegerField(null=True, blank=True)
+    times_used = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -97,9 +153,17 @@ class Purchase(models.Model):
     coupon = models.ForeignKey(Coupon, on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="draft", db_index=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # cart summary, kept up to date by deltas on every line change (see totals_service)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # written only by totals_service UPDATEs, saving a loaded instance must not overwrite
+    # them with the values it loaded (concurrent line edits would be lost)
+    SUMMARY_FIELDS = ("subtotal", "discount", "item_count", "total_amount")
+
     class Meta:
         indexes = [
             models.Index(fields=["shop", "status"]),
@@ -107,6 +171,15 @@ class Purchase(models.Model):
             models.Index(fields=["shop", "created_at"]),
         ]
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SUMMARY_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Purchase #{self.id} - {self.shop.name}"
 
@@ -122,11 +195,101 @@ class PurchaseProduct(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["purchase", "product"]),
+            models.Index(fields=["product", "created_at"]),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the line as loaded so saving or deleting it can move the purchase summary by delta
+        loaded = instance.__dict__
+        if "purchase_id" in loaded and "quantity" in loaded and "price_at_purchase" in loaded:
+            instance._loaded_line = (instance.purchase_id, instance.quantity, instance.price_at_purchase)
+        return instance
+
+    def __str__(self):
+        return f"{self.product.name} x{self.quantity}"
+
+class ArchivedPurchase(models.Model):
+    """
+    Delivered and cancelled purchases moved out of the live table (see archive_service).
+    Same columns as Purchase, ids are kept so coupon redemptions still point at them.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="archived_purchases")
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, null=True, blank=True, related_name="archived_purchases")
+    address = models.ForeignKey('Address', on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_purchases')
+    coupon = models.ForeignKey(Coupon, on_delete=models.SET_NULL, null=True, blank=True, related_name="archived_purchases")
+    status = models.CharField(max_length=20, choices=Purchase.STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["shop", "customer"]),
+            models.Index(fields=["shop", "created_at"]),
         ]
 
+    def __str__(self):
+        return f"Archived purchase #{self.id} - {self.shop.name}"
+
+class ArchivedPurchaseProduct(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    purchase = models.ForeignKey(ArchivedPurchase, on_delete=models.CASCADE, related_name="purchase_products")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="archived_purchase_products")
+    quantity = models.PositiveIntegerField(default=1)
+    price_at_purchase = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
     def __str__(self):
         return f"{self.product.name} x{self.quantity}"
 
+class StockReservation(models.Model):
+    purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE, related_name="stock_reservations", db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_reservations", db_index=True)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("purchase", "product")
+        indexes = [
+            models.Index(fields=["product", "expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x{self.quantity} held for purchase #{self.purchase_id}"
+
+class CouponRedemption(models.Model):
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name="redemptions")
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="coupon_redemptions")
+    # no database constraint: redemptions stay (once per customer coupons count them) when the purchase
+    # is moved to the archive, purchase_id then points at an ArchivedPurchase (look it up by id there)
+    purchase = models.OneToOneField(Purchase, on_delete=models.CASCADE, related_name="coupon_redemption", db_constraint=False)
+    once_per_customer = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["coupon", "customer"],
+                condition=models.Q(once_per_customer=True),
+                name="unique_once_per_customer_redemption",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["coupon", "customer"]),
+        ]
+
+    def __str__(self):
+        return f"{self.coupon_id} redeemed by {self.customer_id} (purchase #{self.purchase_id})"
+
 class PaymentGateway(models.Model):
     name = models.CharField(max_length=100)
     config = models.JSONField(default=dict, null=True, blank=True)
@@ -183,6 +346,8 @@ class Payment(models.Model):
         ("pending", "Pending"),
         ("paid", "Paid"),
         ("failed", "Failed"),
+        # captured by the gateway but the purchase could not be activated: refund or handle manually
+        ("needs_review", "Needs review"),
     ]
     purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE, related_name="payments", db_index=True)
     shop_payment_method = models.ForeignKey(ShopPaymentMethod, on_delete=models.PROTECT, db_index=True)
@@ -199,3 +364,65 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment #{self.id} - {self.status}"
+
+class ArchivedPayment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    purchase = models.ForeignKey(ArchivedPurchase, on_delete=models.CASCADE, related_name="payments")
+    shop_payment_method = models.ForeignKey(ShopPaymentMethod, on_delete=models.PROTECT, related_name="archived_payments")
+    status = models.CharField(max_length=20, choices=Payment.STATUS_CHOICES)
+    transaction_reference = models.CharField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived payment #{self.id} - {self.status}"
+
+
+class PaymentWebhookEvent(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processed", "Processed"),
+        ("failed", "Failed"),
+    ]
+    purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE, related_name="webhook_events", db_index=True)
+    dedup_key = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"Webhook {self.dedup_key} - {self.status}"
+
+
+class IdempotencyKey(models.Model):
+    STATUS_CHOICES = [
+        ("in_progress", "In progress"),
+        ("completed", "Completed"),
+    ]
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="in_progress")
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    # in progress keys expire after the lock timeout, completed ones after the replay TTL
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "key", "endpoint"], name="unique_idempotency_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} {self.endpoint} - {self.status}"
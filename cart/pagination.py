@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination on created_at: every page is a single indexed range scan,
+    so page N costs the same as page 1. Cursors are opaque and stable while rows are added.
+    created_at is not unique, id orders rows sharing a timestamp the same way on every page.
+    """
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 200
@@ -0,0 +1,142 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+class _Plan:
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        # None when a field can not be mapped to a column (method fields, properties...)
+        self.only = []
+
+    def add_only(self, name):
+        if self.only is not None:
+            self.only.append(name)
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only is not None:
+            queryset = queryset.only(*dict.fromkeys(self.only))
+        return queryset
+
+
+def _model_field(model, source):
+    try:
+        return model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+
+
+def _build_plan(model, serializer):
+    """
+    Walks the fields the serializer will render and collects the joins (forward relations),
+    prefetches (reverse and many relations, planned recursively) and columns they need.
+    """
+    plan = _Plan()
+    plan.add_only(model._meta.pk.name)
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*" or len(field.source_attrs) != 1:
+            plan.only = None
+            continue
+
+        model_field = _model_field(model, field.source)
+        if model_field is None:
+            # method fields and properties can read any column
+            plan.only = None
+            continue
+
+        many = isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField))
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+
+        if not model_field.is_relation:
+            plan.add_only(model_field.name)
+            continue
+
+        related_model = model_field.related_model
+        if isinstance(nested, serializers.BaseSerializer):
+            child_plan = _build_plan(related_model, nested)
+        else:
+            # relation rendered as ids
+            child_plan = _Plan()
+            child_plan.add_only(related_model._meta.pk.name)
+
+        if (model_field.many_to_one or model_field.one_to_one) and not many:
+            if not isinstance(nested, serializers.BaseSerializer) and model_field.concrete:
+                # ids of forward relations come from the local column, no join needed
+                plan.add_only(model_field.name)
+                continue
+            plan.add_only(model_field.name)
+            plan.select_related.append(model_field.name)
+            plan.select_related += [f"{model_field.name}__{path}" for path in child_plan.select_related]
+            plan.prefetch_related += [_prefixed(model_field.name, prefetch) for prefetch in child_plan.prefetch_related]
+            if child_plan.only is None:
+                plan.only = None
+            else:
+                for name in child_plan.only:
+                    plan.add_only(f"{model_field.name}__{name}")
+            continue
+
+        # reverse foreign keys and many to many relations are prefetched with their own planned queryset
+        if model_field.one_to_many and child_plan.only is not None:
+            child_plan.add_only(model_field.field.name)
+        plan.prefetch_related.append(
+            Prefetch(model_field.name, queryset=child_plan.apply(related_model._default_manager.all()))
+        )
+
+    return plan
+
+
+def _prefixed(prefix, prefetch):
+    prefetch.add_prefix(prefix)
+    return prefetch
+
+
+def plan_queryset(queryset, serializer, extra_columns=()):
+    """
+    Adds the select_related, prefetch_related and only() calls needed to render
+    the queryset with this (model) serializer without per-row queries.
+    extra_columns are kept loaded for code outside the serializer (e.g. pagination ordering).
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    if not isinstance(serializer, serializers.ModelSerializer) or serializer.Meta.model is not queryset.model:
+        return queryset
+    plan = _build_plan(queryset.model, serializer)
+    for name in extra_columns:
+        plan.add_only(name)
+    return plan.apply(queryset)
+
+
+class QueryPlanningMixin:
+    """
+    Viewset mixin: read requests get their queryset planned from the serializer that renders them,
+    so adding a nested field to a serializer can not introduce an N+1.
+    Writes keep the plain queryset so responses are never rendered from stale prefetched rows.
+    """
+
+    # columns the view reads besides the serialized ones
+    planned_extra_columns = ()
+
+    def plan_queryset(self, queryset):
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        extra_columns = [name.lstrip("-") for name in ordering] + list(self.planned_extra_columns)
+        return plan_queryset(queryset, self.get_serializer(), extra_columns)
+
+    def planned_instance(self, instance, serializer):
+        """
+        Re-reads an instance returned by a write with the queryset planned for the serializer rendering it,
+        the services hand back rows whose nested fields would otherwise be loaded one query per row.
+        """
+        return plan_queryset(type(instance)._default_manager.filter(pk=instance.pk), serializer).get()
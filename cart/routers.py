@@ -0,0 +1,47 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+PRIMARY = "default"
+
+# set by ReplicaRoutingMiddleware for safe requests of clients that did not write recently
+_read_from_replicas = ContextVar("read_from_replicas", default=False)
+
+def replicas():
+    return getattr(settings, "READ_REPLICAS", [])
+
+@contextmanager
+def reads_from_replicas(enabled=True):
+    """Routes the reads made inside the block to the replicas (when any are configured)."""
+    token = _read_from_replicas.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replicas.reset(token)
+
+class ReplicaRouter:
+    """
+    Sends writes to the primary and reads to a random replica, but only inside reads_from_replicas.
+    Everything else (services called from commands, workers, write requests) reads from the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if aliases and _read_from_replicas.get():
+            return random.choice(aliases)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        # reads made after a write in the same request must see it
+        _read_from_replicas.set(False)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
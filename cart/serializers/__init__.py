@@ -1,5 +1,5 @@
 from .products_serializer import ProductSerializer
-from .purchase_products_serializer import PurchaseProductSerializer, CreatePurchaseProductSerializer, UpdatePurchaseProductSerializer, PurchaseProductInputSerializer
+from .purchase_products_serializer import PurchaseProductSerializer, CreatePurchaseProductSerializer, UpdatePurchaseProductSerializer, PurchaseProductInputSerializer, BulkPurchaseProductSerializer
 from .customers_serializer import CustomerSerializer, CreateCustomerSerializer
 from .addresses_serializer import AddressSerializer, CreateAddressSerializer
 from .payments_serializer import PaymentSerializer, PaymentMethodSerializer, PaymentGatewaySerializer
@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from .sparse_fields import SparseFieldsMixin
+from .timing import TimedSerializationMixin
 from cart.models import Address
 
-class AddressSerializer(serializers.ModelSerializer):
+class AddressSerializer(TimedSerializationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Address
         fields = ['line1', 'line2', 'city', 'region', 'country', 'postal_code']
@@ -1,14 +1,25 @@
 from rest_framework import serializers
+from .sparse_fields import SparseFieldsMixin
+from .timing import TimedSerializationMixin
 from cart.models import Customer
 from cart.serializers.addresses_serializer import AddressSerializer
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(TimedSerializationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     address = AddressSerializer(source='addresses', many=True, read_only=True)
 
     class Meta:
         model = Customer
         fields = ['id', 'name', 'email', 'phone', 'address']
 
+    def validate_email(self, value):
+        email = Customer.normalize_email(value)
+        # one customer per (shop, email): a duplicate is a 400 here, not an IntegrityError on save
+        if self.instance is not None and (
+            Customer.objects.filter(shop_id=self.instance.shop_id, email=email).exclude(pk=self.instance.pk).exists()
+        ):
+            raise serializers.ValidationError("A customer with this email already exists.")
+        return email
+
 class CreateCustomerSerializer(serializers.Serializer):
     name = serializers.CharField()
     email = serializers.EmailField()
@@ -1,17 +1,18 @@
 from rest_framework import serializers
+from .sparse_fields import SparseFieldsMixin
 from cart.models import PaymentGateway, PaymentMethod, Payment, ShopPaymentMethod, GatewayPaymentMethod
 
-class PaymentGatewaySerializer(serializers.ModelSerializer):
+class PaymentGatewaySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PaymentGateway
         fields = ['id', 'name', 'config', 'is_active']
 
-class PaymentMethodSerializer(serializers.ModelSerializer):
+class PaymentMethodSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PaymentMethod
         fields = ['id', 'name', 'is_active']
 
-class GatewayPaymentMethodSerializer(serializers.ModelSerializer):
+class GatewayPaymentMethodSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     gateway = PaymentGatewaySerializer(read_only=True)
     payment_method = PaymentMethodSerializer(read_only=True)
 
@@ -20,14 +21,14 @@ class GatewayPaymentMethodSerializer(serializers.ModelSerializer):
         fields = ['gateway', 'payment_method']
 
 
-class ShopPaymentMethodSerializer(serializers.ModelSerializer):
+class ShopPaymentMethodSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     gateway_payment_method = GatewayPaymentMethodSerializer(read_only=True)
     class Meta:
         model = ShopPaymentMethod
         fields = ['gateway_payment_method']
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     method = ShopPaymentMethodSerializer(source='shop_payment_method', read_only=True)
 
     class Meta:
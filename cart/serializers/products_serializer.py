@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from .sparse_fields import SparseFieldsMixin
+from .timing import TimedSerializationMixin
 from cart.models import Product
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['id', 'name', 'sku', 'price', 'stock', 'is_active']
@@ -1,8 +1,10 @@
 from rest_framework import serializers
+from .sparse_fields import SparseFieldsMixin
+from .timing import TimedSerializationMixin
 from cart.models import PurchaseProduct
 from .products_serializer import ProductSerializer
 
-class PurchaseProductSerializer(serializers.ModelSerializer):
+class PurchaseProductSerializer(TimedSerializationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
 
     class Meta:
@@ -21,4 +23,12 @@ class UpdatePurchaseProductSerializer(serializers.Serializer):
 
 class PurchaseProductInputSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
-    quantity = serializers.IntegerField(min_value=1)
\ No newline at end of file
+    quantity = serializers.IntegerField(min_value=1)
+
+class PurchaseProductLineSerializer(PurchaseProductInputSerializer):
+    price_at_purchase = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+class BulkPurchaseProductSerializer(serializers.Serializer):
+    purchase_id = serializers.IntegerField()
+    mode = serializers.ChoiceField(choices=[("add", "Add to existing quantity"), ("set", "Set quantity")], default="add")
+    lines = PurchaseProductLineSerializer(many=True, allow_empty=False)
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from .sparse_fields import SparseFieldsMixin
+from .timing import TimedSerializationMixin
 from cart.models import Purchase
 from .purchase_products_serializer import PurchaseProductSerializer, PurchaseProductInputSerializer
 from .coupons_serializer import CouponSerializer
@@ -6,7 +8,7 @@ from .addresses_serializer import AddressSerializer, CreateAddressSerializer
 from .customers_serializer import CustomerSerializer, CreateCustomerSerializer
 from .payments_serializer import PaymentSerializer
 
-class PurchaseSerializer(serializers.ModelSerializer):
+class PurchaseSerializer(TimedSerializationMixin, SparseFieldsMixin, serializers.ModelSerializer):
     products = PurchaseProductSerializer(source='purchase_products', many=True, read_only=True)
     coupon = CouponSerializer(read_only=True)
     address = AddressSerializer(read_only=True)
@@ -0,0 +1,62 @@
+from rest_framework import serializers
+
+# Requested fields/expansions are parsed into trees: "id,customer.name" -> {"id": {}, "customer": {"name": {}}}
+
+def parse_field_tree(value):
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsMixin:
+    """
+    Lets clients prune the serializer tree through query parameters:
+      ?fields=id,status,customer.name   only render these fields, dotted paths reach into nested serializers
+      ?expand=customer,products         render only these relations as nested objects, the others as ids
+    Without the parameters the full tree is rendered.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            self._requested_fields = parse_field_tree(fields)
+        if expand is not None:
+            self._expanded_fields = parse_field_tree(expand)
+
+    def _field_trees(self):
+        # the root serializer reads the request, nested ones get their subtree from the parent
+        if not hasattr(self, "_requested_fields") or not hasattr(self, "_expanded_fields"):
+            request = self.context.get("request")
+            params = request.query_params if request is not None else {}
+            if not hasattr(self, "_requested_fields"):
+                self._requested_fields = parse_field_tree(params.get("fields"))
+            if not hasattr(self, "_expanded_fields"):
+                self._expanded_fields = parse_field_tree(params.get("expand"))
+        return self._requested_fields, self._expanded_fields
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expanded = self._field_trees()
+
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+
+        for name, field in list(fields.items()):
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+
+            if expanded is not None and name not in expanded:
+                fields[name] = serializers.PrimaryKeyRelatedField(source=field.source, many=many, read_only=True)
+                continue
+
+            nested._requested_fields = requested.get(name) or None if requested else None
+            nested._expanded_fields = expanded.get(name, {}) if expanded is not None else None
+        return fields
@@ -0,0 +1,14 @@
+from rest_framework import serializers
+from cart import metrics
+
+
+class TimedSerializationMixin:
+    """Reports the time spent rendering the response objects to the request metrics."""
+
+    def to_representation(self, instance):
+        # only the objects at the top of the response, nested serializers run inside them
+        parent = self.parent
+        if parent is not None and not (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            return super().to_representation(instance)
+        with metrics.timer("serialization"):
+            return super().to_representation(instance)
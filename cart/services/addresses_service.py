@@ -1,7 +1,96 @@
 from django.db import transaction
+from django.db.models import Count, Min, Q
 from django.utils import timezone
-from cart.models import Address
+from cart.models import Address, ArchivedPurchase, Purchase
+
+def _normalized(data):
+    return {
+        key: Address.normalize(value) if key in Address.FINGERPRINT_FIELDS else value
+        for key, value in data.items()
+    }
 
 def create(data):
-    address = Address.objects.create(**data)
-    return address
\ No newline at end of file
+    address = Address.objects.create(**_normalized(data))
+    return address
+
+def find_or_create(data):
+    """
+    Returns the customer's address identical to data (ignoring case and whitespace),
+    found with one indexed lookup on (customer, fingerprint), or creates it.
+    """
+    data = _normalized(data)
+    customer_id = data["customer"].pk if "customer" in data else data["customer_id"]
+    address = (
+        Address.objects.filter(customer_id=customer_id, fingerprint=Address.fingerprint_for(data))
+        .order_by("id")
+        .first()
+    )
+    if address:
+        return address
+    return Address.objects.create(**data)
+
+@transaction.atomic
+def update(address, data):
+    """
+    Updates an address in place (copy on write): placed purchases shipped
+    to it are first moved to a retired copy holding the old values.
+    """
+    _retire_for_placed_purchases(address)
+    for name, value in _normalized(data).items():
+        setattr(address, name, value)
+    address.save()
+    return address
+
+@transaction.atomic
+def delete(address):
+    """Deletes an address, placed purchases shipped to it keep a retired copy."""
+    _retire_for_placed_purchases(address)
+    address.delete()
+
+def _retire_for_placed_purchases(address):
+    placed = Purchase.objects.filter(address=address).exclude(status="draft")
+    archived = ArchivedPurchase.objects.filter(address=address)
+    if not placed.exists() and not archived.exists():
+        return
+    copy = Address.objects.create(
+        customer_id=address.customer_id,
+        retired=True,
+        **{name: getattr(address, name) for name in Address.FINGERPRINT_FIELDS},
+    )
+    placed.update(address=copy)
+    archived.update(address=copy)
+
+def fill_fingerprints(batch_size=1000):
+    """Fingerprints one batch of addresses created before fingerprints existed, returns how many."""
+    addresses = list(Address.objects.filter(fingerprint="")[:batch_size])
+    for address in addresses:
+        address.fingerprint = Address.fingerprint_for({name: getattr(address, name) for name in Address.FINGERPRINT_FIELDS})
+    Address.objects.bulk_update(addresses, ["fingerprint"])
+    return len(addresses)
+
+def collapse_duplicates(batch_size=1000):
+    """
+    Merges one batch of duplicate address groups (same customer and fingerprint) into their oldest address:
+    live and archived purchases are pointed at it, it stays default when any duplicate was, the others are deleted.
+    Returns the number of deleted addresses.
+    """
+    groups = list(
+        Address.objects.exclude(fingerprint="")
+        .values("customer_id", "fingerprint")
+        .annotate(copies=Count("id"), keep=Min("id"), defaults=Count("id", filter=Q(is_default=True)))
+        .filter(copies__gt=1)
+        .order_by()[:batch_size]
+    )
+    deleted = 0
+    for group in groups:
+        with transaction.atomic():
+            duplicates = Address.objects.filter(
+                customer_id=group["customer_id"], fingerprint=group["fingerprint"]
+            ).exclude(pk=group["keep"])
+            Purchase.objects.filter(address__in=duplicates).update(address_id=group["keep"], updated_at=timezone.now())
+            # archived receipts would otherwise lose their address to SET_NULL
+            ArchivedPurchase.objects.filter(address__in=duplicates).update(address_id=group["keep"])
+            if group["defaults"]:
+                Address.objects.filter(pk=group["keep"]).update(is_default=True)
+            deleted += duplicates.delete()[1].get(Address._meta.label, 0)
+    return deleted
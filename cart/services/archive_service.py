@@ -0,0 +1,81 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from cart.models import (
+    ArchivedPayment, ArchivedPurchase, ArchivedPurchaseProduct,
+    Payment, PaymentWebhookEvent, Purchase, PurchaseProduct, StockReservation
+)
+
+# purchases in these states no longer change and are moved out of the live tables
+ARCHIVED_STATUSES = ("delivered", "cancelled")
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+def archive_completed(after_id=0, batch_size=1000):
+    """
+    Moves one batch of delivered and cancelled purchases (by id, after after_id) not updated for
+    PURCHASE_ARCHIVE_AFTER seconds, with their lines and payments, to the archive tables.
+    Purchases with unprocessed payment webhooks are kept until the worker handles them.
+    Returns the last moved id (None when there is nothing left), the number of purchases and of lines moved.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.PURCHASE_ARCHIVE_AFTER)
+    using = router.db_for_write(Purchase)
+    with transaction.atomic(using=using):
+        purchases = list(
+            Purchase.objects.using(using).select_for_update(skip_locked=True)
+            .filter(pk__gt=after_id, status__in=ARCHIVED_STATUSES, updated_at__lte=cutoff)
+            .exclude(webhook_events__status__in=("pending", "failed"))
+            .order_by("pk")
+            .values(*_columns(Purchase))[:batch_size]
+        )
+        if not purchases:
+            return None, 0, 0
+        ids = [row["id"] for row in purchases]
+        lines = list(PurchaseProduct.objects.using(using).filter(purchase_id__in=ids).values(*_columns(PurchaseProduct)))
+        payments = list(Payment.objects.using(using).filter(purchase_id__in=ids).values(*_columns(Payment)))
+
+        # copied as plain rows, archived ids are the live ones
+        ArchivedPurchase.objects.using(using).bulk_create([ArchivedPurchase(**row) for row in purchases])
+        ArchivedPurchaseProduct.objects.using(using).bulk_create([ArchivedPurchaseProduct(**row) for row in lines])
+        ArchivedPayment.objects.using(using).bulk_create([ArchivedPayment(**row) for row in payments])
+
+        # coupon redemptions stay in place with the purchase id, processed webhooks are only kept for deduplication
+        StockReservation.objects.using(using).filter(purchase_id__in=ids)._raw_delete(using)
+        PaymentWebhookEvent.objects.using(using).filter(purchase_id__in=ids)._raw_delete(using)
+        Payment.objects.using(using).filter(purchase_id__in=ids)._raw_delete(using)
+        PurchaseProduct.objects.using(using).filter(purchase_id__in=ids)._raw_delete(using)
+        Purchase.objects.using(using).filter(pk__in=ids)._raw_delete(using)
+    return ids[-1], len(purchases), len(lines)
+
+def find(shop, pk):
+    """
+    Returns a placed (not draft) purchase of the shop from the live table,
+    or its archived copy once it was moved, None when there is neither.
+    """
+    for model, line_model, filters in (
+        (Purchase, PurchaseProduct, {"status__in": [status for status, _ in Purchase.STATUS_CHOICES if status != "draft"]}),
+        (ArchivedPurchase, ArchivedPurchaseProduct, {}),
+    ):
+        purchase = (
+            model.objects.filter(shop=shop, pk=pk, **filters)
+            .select_related("customer", "coupon", "address")
+            .prefetch_related(Prefetch("purchase_products", line_model.objects.select_related("product")), "payments")
+            .first()
+        )
+        if purchase is not None:
+            return purchase
+    return None
+
+def late_webhook(shop, pk):
+    """
+    Result for a payment webhook of an archived purchase (None when it was not archived).
+    Its payment is final, the delivery is answered like an already handled one and nothing is stored.
+    """
+    purchase = ArchivedPurchase.objects.filter(shop=shop, pk=pk).first()
+    if purchase is None:
+        return None
+    return {"success": purchase.payments.filter(status="paid").exists(), "duplicate": True}
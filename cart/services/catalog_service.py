@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from cart.cache import TTLCache, MISSING
+from cart.models import Shop
+
+# shop id -> (catalog version, last modified), lets current clients get a 304 without a query
+version_cache = TTLCache(
+    max_size=getattr(settings, "CATALOG_CACHE_MAX_SIZE", 2048),
+    ttl=getattr(settings, "CATALOG_VERSION_TTL", 5),
+)
+# (shop id, catalog version, request path) -> response data, bumping the version orphans old entries
+response_cache = TTLCache(
+    max_size=getattr(settings, "CATALOG_CACHE_MAX_SIZE", 2048),
+    ttl=getattr(settings, "CATALOG_CACHE_TTL", 300),
+)
+
+def get_version(shop):
+    """Returns the shop's catalog version and when it last changed."""
+    version = version_cache.get(shop.pk)
+    if version is MISSING:
+        catalog_version, updated_at, created_at = Shop.objects.filter(pk=shop.pk).values_list(
+            "catalog_version", "catalog_updated_at", "created_at"
+        ).get()
+        version = (catalog_version, updated_at or created_at)
+        version_cache.set(shop.pk, version)
+    return version
+
+def get_or_build(shop, version, key, build):
+    """Returns the cached response data for key at this catalog version, building it on a miss."""
+    cache_key = (shop.pk, version, key)
+    data = response_cache.get(cache_key)
+    if data is MISSING:
+        data = build()
+        response_cache.set(cache_key, data)
+    return data
+
+def bump(*shop_ids):
+    """Marks the shops' catalogs as changed, called on every product write."""
+    Shop.objects.filter(pk__in=shop_ids).update(catalog_version=F("catalog_version") + 1, catalog_updated_at=timezone.now())
+    _forget(shop_ids)
+    # a read inside the transaction may have cached the old version again
+    transaction.on_commit(lambda: _forget(shop_ids))
+
+def bump_on_commit(*shop_ids):
+    """Bumps the shops' catalogs once the current transaction commits, keeping the shop row lock out of it."""
+    transaction.on_commit(lambda: bump(*shop_ids))
+
+def _forget(shop_ids):
+    for shop_id in shop_ids:
+        version_cache.delete(shop_id)
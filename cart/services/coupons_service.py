@@ -1,29 +1,124 @@
+import copy
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
 from django.utils import timezone
-from cart.models import Coupon, Purchase, PurchaseProduct
+from cart.cache import TTLCache, MISSING
+from cart.models import Coupon, CouponRedemption, Purchase, PurchaseProduct
 from django.core.exceptions import ValidationError
 
+# Marker stored for codes that do not exist in a shop (negative cache)
+UNKNOWN_COUPON = object()
+
+coupon_cache = TTLCache(
+    max_size=getattr(settings, "COUPON_CACHE_MAX_SIZE", 10000),
+    ttl=getattr(settings, "COUPON_CACHE_TTL", 60),
+)
+
+def get_coupon(shop, coupon_code, min_updated_at=None):
+    """
+    Returns the shop's coupon with this code (active or not) or None.
+    Lookups, including ones for unknown codes, are cached per (shop, code).
+    A cached coupon older than min_updated_at is treated as stale and reloaded.
+    """
+    key = (shop.id, coupon_code)
+    coupon = coupon_cache.get(key)
+    if coupon is UNKNOWN_COUPON and min_updated_at is None:
+        return None
+    if coupon is UNKNOWN_COUPON or coupon is MISSING or (min_updated_at and coupon.updated_at < min_updated_at):
+        coupon = Coupon.objects.filter(shop=shop, code=coupon_code).first()
+        if coupon is None:
+            coupon_cache.set(key, UNKNOWN_COUPON, ttl=getattr(settings, "COUPON_NEGATIVE_CACHE_TTL", 30))
+            return None
+        coupon_cache.set(key, coupon)
+    return copy.copy(coupon)
+
+def invalidate(coupon):
+    """
+    Drops cached entries for the coupon, including the one under its old code
+    and any negative entry for its current code.
+    """
+    coupon_cache.delete((coupon.shop_id, coupon.code))
+    coupon_cache.delete_where(lambda cached: cached is not UNKNOWN_COUPON and cached.pk == coupon.pk)
+
 def validate(purchase, coupon_code):
-    coupon = Coupon.objects.filter(shop=purchase.shop, code=coupon_code, is_active=True).first()
+    # the purchase's own coupon tells us the newest version the cache must have
+    min_updated_at = None
+    if Purchase.coupon.is_cached(purchase) and purchase.coupon and purchase.coupon.code == coupon_code:
+        min_updated_at = purchase.coupon.updated_at
+    coupon = get_coupon(purchase.shop, coupon_code, min_updated_at)
 
-    if not coupon:
+    if not coupon or not coupon.is_active:
         raise ValidationError("Invalid or inactive coupon.")
 
     now = timezone.now().date()
     if coupon.valid_from and coupon.valid_from > now or coupon.valid_to and coupon.valid_to < now:
         raise ValidationError("Coupon expired.")
 
-    purchase_products = purchase.purchase_products.all()
-    subtotal = subtotal = sum(pp.quantity * pp.price_at_purchase for pp in purchase_products)
-    if coupon.min_cart_value and subtotal < coupon.min_cart_value:
+    if coupon.min_cart_value and purchase.subtotal < coupon.min_cart_value:
         raise ValidationError("Cart total below minimum for this coupon.") 
 
-    if coupon.once_per_customer and purchase.customer:
-        previous_uses = Purchase.objects.filter(
-            shop=purchase.shop,
-            customer=purchase.customer,
+    if coupon.usage_limit is not None and coupon.times_used >= coupon.usage_limit:
+        raise ValidationError("Coupon usage limit reached.")
+
+    if coupon.once_per_customer and purchase.customer_id:
+        previous_uses = CouponRedemption.objects.filter(
             coupon=coupon,
-            status='active'
-        ).exclude(id=purchase.id).exists()
+            customer_id=purchase.customer_id,
+            once_per_customer=True,
+        ).exclude(purchase=purchase).exists()
         if previous_uses:
             raise ValidationError("Coupon can only be used once per customer.")
     return True
+
+def redeem(purchase):
+    """
+    Records the redemption of the purchase coupon in the ledger.
+    The usage counter and the (coupon, customer) unique constraint make
+    concurrent redemptions safe, the database rejects the second one.
+    """
+    coupon = purchase.coupon
+    if not coupon:
+        return
+
+    # no savepoint: a failure here aborts the whole activation anyway
+    with transaction.atomic(savepoint=False):
+        counted = Coupon.objects.filter(
+            Q(usage_limit__isnull=True) | Q(times_used__lt=F("usage_limit")),
+            pk=coupon.pk,
+        ).update(times_used=F("times_used") + 1)
+        if not counted:
+            raise ValidationError("Coupon usage limit reached.")
+        _forget(coupon)
+
+        if not purchase.customer_id:
+            return
+        try:
+            CouponRedemption.objects.create(
+                coupon=coupon,
+                customer_id=purchase.customer_id,
+                purchase=purchase,
+                once_per_customer=coupon.once_per_customer,
+            )
+        except IntegrityError:
+            raise ValidationError("Coupon can only be used once per customer.")
+
+def release(purchase):
+    """
+    Gives back the redemption of a cancelled purchase: the usage counter is
+    decremented and its ledger row removed, so the coupon can be used again.
+    """
+    coupon = purchase.coupon
+    if not coupon:
+        return
+
+    with transaction.atomic(savepoint=False):
+        Coupon.objects.filter(pk=coupon.pk, times_used__gt=0).update(times_used=F("times_used") - 1)
+        CouponRedemption.objects.filter(coupon=coupon, purchase=purchase).delete()
+        _forget(coupon)
+
+def _forget(coupon):
+    # times_used changes through a queryset update, which sends no Coupon signal
+    invalidate(coupon)
+    # a read inside the transaction may have cached the old counter again
+    transaction.on_commit(lambda: invalidate(coupon))
@@ -1,15 +1,70 @@
 from django.db import transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from cart.models import Customer, Purchase
+
+UPSERT_FIELDS = ["name", "phone", "updated_at"]
+
+normalize_email = Customer.normalize_email
+
+def _upsert(shop, rows):
+    # INSERT ... ON CONFLICT (shop_id, email) DO UPDATE: one statement, safe against concurrent creates
+    now = timezone.now()
+    customers = [Customer(shop=shop, created_at=now, updated_at=now, **row) for row in rows]
+    customers = Customer.objects.bulk_create(
+        customers, update_conflicts=True, unique_fields=["shop", "email"], update_fields=UPSERT_FIELDS
+    )
+    # bulk_create sends no post_save: drafts rendering these customers get a new ETag here
+    Purchase.objects.filter(
+        status="draft", customer__shop=shop, customer__email__in=[row["email"] for row in rows]
+    ).update(updated_at=now)
+    return customers
 
 def find_or_create(shop, data):
-    email = data["email"]
-    customer = shop.customers.filter(email=email).first()
-    if customer:
-        for key, value in data.items():
-            setattr(customer, key, value)
-        customer.save()
+    """
+    Returns the shop's customer with this email, created or updated from data.
+    Unchanged customers cost one indexed lookup and no write.
+    """
+    data = {**data, "email": normalize_email(data["email"])}
+    customer = shop.customers.filter(email=data["email"]).first()
+    if customer and all(getattr(customer, key) == value for key, value in data.items()):
         return customer
-    customer = shop.customers.create(**data)
+
+    customer = _upsert(shop, [data])[0]
+    customer.shop = shop
     return customer
-   
\ No newline at end of file
+
+def bulk_upsert(shop, rows, batch_size=1000):
+    """
+    Creates or updates many customers (e.g. an imported list) keyed on email.
+    Rows repeating an email are merged (the last one wins) and unchanged customers are not written.
+    Returns the number of created, updated and unchanged customers.
+    """
+    counts = {"created": 0, "updated": 0, "unchanged": 0}
+    merged = {}
+    for row in rows:
+        row = {**row, "email": normalize_email(row["email"])}
+        merged[row["email"]] = row
+    rows = list(merged.values())
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        existing = {
+            customer.email: customer
+            for customer in shop.customers.filter(email__in=[row["email"] for row in batch]).only("email", "name", "phone")
+        }
+        changed = []
+        for row in batch:
+            customer = existing.get(row["email"])
+            if customer is None:
+                counts["created"] += 1
+            elif all(getattr(customer, key) == value for key, value in row.items()):
+                counts["unchanged"] += 1
+                continue
+            else:
+                counts["updated"] += 1
+            changed.append(row)
+        if changed:
+            with transaction.atomic():
+                _upsert(shop, changed)
+    return counts
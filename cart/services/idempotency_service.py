@@ -0,0 +1,80 @@
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from cart.models import IdempotencyKey
+from django.core.exceptions import ValidationError
+
+
+def request_hash(body):
+    return hashlib.sha256(body or b"").hexdigest()
+
+def begin(shop, key, endpoint, body):
+    """
+    Claims an Idempotency-Key before running the request.
+    Returns (record, None) when the request should run, or (None, record) with the stored response to replay.
+    Raises ValidationError with code "in_progress" while the first request is still running,
+    and "mismatch" when the key was used for a different request body.
+    """
+    digest = request_hash(body)
+    now = timezone.now()
+    lock_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+
+    # retries of a finished request cost this single lookup
+    record = IdempotencyKey.objects.filter(shop=shop, key=key, endpoint=endpoint).first()
+    if record is None:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    shop=shop, key=key, endpoint=endpoint, request_hash=digest, expires_at=lock_until
+                )
+            return record, None
+        except IntegrityError:
+            # a concurrent duplicate claimed the key first
+            record = IdempotencyKey.objects.get(shop=shop, key=key, endpoint=endpoint)
+
+    if record.expires_at <= now:
+        # the stored response expired or the first request died, whoever resets the row runs the request
+        claimed = IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).update(
+            status="in_progress", request_hash=digest, response_status=None, response_body=None, expires_at=lock_until
+        )
+        if claimed:
+            record.status, record.request_hash, record.expires_at = "in_progress", digest, lock_until
+            return record, None
+        record.refresh_from_db()
+
+    if record.request_hash != digest:
+        raise ValidationError("Idempotency-Key was already used for a different request.", code="mismatch")
+    if record.status == "in_progress":
+        raise ValidationError("A request with this Idempotency-Key is still in progress.", code="in_progress")
+    return None, record
+
+def complete(record, status_code, body):
+    """
+    Stores the response to replay for retries of the key.
+    Server errors are not stored: the key is released so a retry runs the request again.
+    """
+    if status_code >= 500:
+        release(record)
+        return
+    expires_at = timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status="completed", response_status=status_code, response_body=body, expires_at=expires_at
+    )
+
+def release(record):
+    """Forgets a key whose request failed, a retry runs it again."""
+    IdempotencyKey.objects.filter(pk=record.pk, status="in_progress").delete()
+
+def purge_expired(batch_size=1000):
+    """Deletes one batch of expired keys and returns the number of rows deleted."""
+    ids = list(
+        IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+        .order_by("expires_at")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    deleted, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+    return deleted
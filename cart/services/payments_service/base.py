@@ -1,6 +1,30 @@
+from asgiref.sync import sync_to_async
+
+
 class BasePaymentGateway:
+    """
+    Gateway instances are created once per shop payment method and reused across
+    requests, so configure() is the place to build long lived clients (HTTP sessions, pools).
+    """
+    def configure(self, config):
+        pass
+
+    def close(self):
+        """Releases long lived clients when the instance is replaced or dropped."""
+        pass
+
     def initialize_payment(self, purchase: 'Purchase', payment_method: 'PaymentMethod'):
         raise NotImplementedError
 
     def handle_webhook(self, purchase, data):
         raise NotImplementedError
+
+    async def ainitialize_payment(self, purchase: 'Purchase', payment_method: 'PaymentMethod'):
+        """
+        Async variant used by the ASGI endpoints. Gateways with an async HTTP client override it,
+        otherwise the sync call runs in a worker thread.
+        """
+        return await sync_to_async(self.initialize_payment, thread_sensitive=False)(purchase, payment_method)
+
+    async def ahandle_webhook(self, purchase, data):
+        return await sync_to_async(self.handle_webhook, thread_sensitive=False)(purchase, data)
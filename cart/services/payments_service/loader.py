@@ -1,21 +1,76 @@
+import importlib
+import pkgutil
+import threading
 from cart.models import ShopPaymentMethod
+from .base import BasePaymentGateway
+
+# module name -> gateway class, resolved once at startup
+_gateway_classes = {}
+# shop payment method id -> (config version, configured gateway instance)
+_gateway_instances = {}
+_lock = threading.Lock()
+
+def _module_name(gateway_name):
+    return gateway_name.lower().replace(" ", "_").replace("-", "_")
+
+def load_gateway_classes():
+    """
+    Imports every gateway module of this package once.
+    Each module must define a class named <GatewayName>Gateway where GatewayName is the module name converted to camel case
+    """
+    classes = {}
+    package = importlib.import_module(__package__)
+    for module_info in pkgutil.iter_modules(package.__path__):
+        if module_info.name in ("base", "loader"):
+            continue
+        module = importlib.import_module(f"{__package__}.{module_info.name}")
+        camel_case_name = "".join(word.capitalize() for word in module_info.name.split("_"))
+        gateway_class = getattr(module, f"{camel_case_name}Gateway", None)
+        if gateway_class and issubclass(gateway_class, BasePaymentGateway):
+            classes[module_info.name] = gateway_class
+
+    with _lock:
+        _gateway_classes.clear()
+        _gateway_classes.update(classes)
 
 def get_gateway(shop_payment_method: ShopPaymentMethod):
-    try:
-        payment_gateway_name = shop_payment_method.gateway_payment_method.gateway.name.lower()
-        config = shop_payment_method.config
-        # Import module dynamically
-        module = __import__(f"cart.services.payments_service.{payment_gateway_name}", fromlist=["*"])
-        # Each module must define a class named <GatewayName>Gateway where GatewayName is converted to camel case
-        camel_case_name = "".join(word.capitalize() for word in payment_gateway_name.split("_"))
-        class_name = f"{camel_case_name}Gateway"
-        gateway_class = getattr(module, class_name)
-        gateway_instance = gateway_class()
-
-        # Configure gateway if it has a configure() method
-        if hasattr(gateway_instance, "configure"):
-            gateway_instance.configure(config)
-
-        return gateway_instance
-    except (ImportError, AttributeError) as e:
-        raise ValueError(f"Unknown or misconfigured gateway: {payment_gateway_name}") from e
+    """
+    Returns the configured gateway for the shop payment method.
+    Instances are kept per shop payment method and reused (with their HTTP clients)
+    until its config version (updated_at) changes.
+    """
+    version = shop_payment_method.updated_at
+    cached = _gateway_instances.get(shop_payment_method.id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    if not _gateway_classes:
+        load_gateway_classes()
+
+    payment_gateway_name = _module_name(shop_payment_method.gateway_payment_method.gateway.name)
+    gateway_class = _gateway_classes.get(payment_gateway_name)
+    if gateway_class is None:
+        raise ValueError(f"Unknown or misconfigured gateway: {payment_gateway_name}")
+
+    gateway_instance = gateway_class()
+    gateway_instance.configure(shop_payment_method.config)
+
+    with _lock:
+        previous = _gateway_instances.get(shop_payment_method.id)
+        _gateway_instances[shop_payment_method.id] = (version, gateway_instance)
+    if previous:
+        previous[1].close()
+    return gateway_instance
+
+def invalidate(shop_payment_method_id=None):
+    """
+    Drops the cached gateway instance of a shop payment method, or all of them.
+    """
+    with _lock:
+        if shop_payment_method_id is None:
+            evicted = list(_gateway_instances.values())
+            _gateway_instances.clear()
+        else:
+            evicted = [_gateway_instances.pop(shop_payment_method_id)] if shop_payment_method_id in _gateway_instances else []
+    for _, gateway_instance in evicted:
+        gateway_instance.close()
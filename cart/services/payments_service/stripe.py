@@ -5,6 +5,7 @@ class StripeGateway(BasePaymentGateway):
     def configure(self, config):
         self.api_key = config.get("api_key")
         self.webhook_secret = config.get("webhook_secret")
+        ## the Stripe HTTP client would be created here once; the instance is reused across requests
 
     def initialize_payment(self, purchase, payment_method):
         # ... create Stripe session or charge
@@ -0,0 +1,27 @@
+import asyncio
+import time
+import uuid
+from .base import BasePaymentGateway
+
+class StubGateway(BasePaymentGateway):
+    """
+    Local gateway for development and load tests: no network calls,
+    it answers after config["delay"] seconds.
+    """
+    def configure(self, config):
+        self.delay = float(config.get("delay", 0))
+        self.succeed = config.get("succeed", True)
+
+    def initialize_payment(self, purchase, payment_method):
+        time.sleep(self.delay)
+        return f"stub_{purchase.id}_{uuid.uuid4().hex}"
+
+    async def ainitialize_payment(self, purchase, payment_method):
+        await asyncio.sleep(self.delay)
+        return f"stub_{purchase.id}_{uuid.uuid4().hex}"
+
+    def handle_webhook(self, purchase, data):
+        return self.succeed
+
+    async def ahandle_webhook(self, purchase, data):
+        return self.succeed
@@ -0,0 +1,68 @@
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from cart.models import Product, StockReservation
+
+
+class _InsufficientStock(Exception):
+    pass
+
+def held_stock(exclude_purchase=None):
+    """
+    Expression for the quantity of a product held by live (unexpired) reservations,
+    ignoring the ones of exclude_purchase.
+    """
+    holds = StockReservation.objects.filter(product=OuterRef("pk"), expires_at__gt=timezone.now())
+    if exclude_purchase is not None:
+        holds = holds.exclude(purchase=exclude_purchase)
+    total = holds.values("product").annotate(total=Sum("quantity")).values("total")
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0), output_field=IntegerField())
+
+def annotate_available_stock(queryset, exclude_purchase=None):
+    """Annotates products with available_stock: stock minus live holds of other purchases."""
+    return queryset.annotate(
+        available_stock=ExpressionWrapper(F("stock") - held_stock(exclude_purchase), output_field=IntegerField())
+    )
+
+def available_stock(product_ids, exclude_purchase=None):
+    """Returns {product_id: available stock} for the given products in one query."""
+    products = annotate_available_stock(Product.objects.filter(pk__in=product_ids), exclude_purchase)
+    return dict(products.values_list("id", "available_stock"))
+
+def decrement_stock(quantities, purchase=None):
+    """
+    Decrements stock for {product_id: quantity} in a single guarded UPDATE.
+    Stock held for other purchases is not available to this one.
+    Either every product is decremented or none is; returns the ids of the
+    products that did not have enough stock (empty list on success).
+    """
+    if not quantities:
+        return []
+
+    held = held_stock(exclude_purchase=purchase)
+    has_stock = reduce(or_, (
+        Q(pk=product_id, stock__gte=held + Value(quantity))
+        for product_id, quantity in quantities.items()
+    ))
+    requested = Case(
+        *(When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()),
+        default=Value(0),
+    )
+
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(has_stock).update(
+                stock=F("stock") - requested,
+                updated_at=timezone.now(),
+            )
+            if updated != len(quantities):
+                # roll back the partial decrement, the shortage is reported below
+                raise _InsufficientStock()
+    except _InsufficientStock:
+        in_stock = set(Product.objects.filter(has_stock).values_list("id", flat=True))
+        return sorted(set(quantities) - in_stock)
+
+    return []
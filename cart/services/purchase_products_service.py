@@ -5,10 +5,13 @@ from django.utils import timezone
 from cart.models import (
     Purchase, Product, PurchaseProduct
 )
+from cart.services.products_service import annotate_available_stock
+from cart.services.totals_service import coalesce_totals, apply_summary, line_delta, line_values
 from django.core.exceptions import ValidationError
 
 
 @transaction.atomic
+@coalesce_totals()
 def create(data):
     """
     Creates a new purchase product and set its price at purchase.
@@ -17,9 +20,9 @@ def create(data):
     if purchase.status == "active":
         raise ValidationError(f"Cannot add products to an active purchase.") 
 
-    product = Product.objects.get(id=data["product_id"])
-    if product.stock < data["quantity"]:
-        raise ValidationError(f"Insufficient stock for product {product.name}. Available: {product.stock}, Requested: {data['quantity']}")
+    product = annotate_available_stock(Product.objects, exclude_purchase=purchase).get(id=data["product_id"])
+    if product.available_stock < data["quantity"]:
+        raise ValidationError(f"Insufficient stock for product {product.name}. Available: {product.available_stock}, Requested: {data['quantity']}")
 
 
     purchase_product = PurchaseProduct.objects.filter(
@@ -29,18 +32,19 @@ def create(data):
     
     if purchase_product:
         purchase_product.quantity += data["quantity"]
+        purchase_product.save() # this schedules the purchase total recalculation via signal
     else:
-        price_at_purchase = data["price_at_purchase"] if "price_at_purchase" in data else Product.objects.get(id=data["product_id"]).price
+        price_at_purchase = data["price_at_purchase"] if "price_at_purchase" in data else product.price
         purchase_product = PurchaseProduct.objects.create(
-            purchase_id=data["purchase_id"],
+            purchase=purchase,
             product_id=data["product_id"],
             quantity=data["quantity"],
             price_at_purchase=price_at_purchase
         )
 
-    purchase_product.save() # this should trigger the signal to recalculate purchase total
     return purchase_product
 
+@coalesce_totals()
 def update_one(purchase_product, data):
     """
     Update purchase product details like quantity and price at purchase.
@@ -50,16 +54,17 @@ def update_one(purchase_product, data):
     if purchase.status == "active":
         raise ValidationError(f"Cannot edit products in an active purchase.") 
 
-    product = purchase_product.product
-    if product.stock < data["quantity"]:
-        raise ValidationError(f"Insufficient stock for product {product.name}. Available: {product.stock}, Requested: {data['quantity']}")
+    product = annotate_available_stock(Product.objects, exclude_purchase=purchase).get(id=purchase_product.product_id)
+    if "quantity" in data and product.available_stock < data["quantity"]:
+        raise ValidationError(f"Insufficient stock for product {product.name}. Available: {product.available_stock}, Requested: {data['quantity']}")
         
     for field, value in data.items():
         setattr(purchase_product, field, value)
 
-    purchase_product.save()  # this should trigger the signal to recalculate purchase total
+    purchase_product.save()  # this schedules the purchase total recalculation via signal
     return purchase_product
 
+@coalesce_totals()
 def delete_one(purchase_product):
     """
     Deletes a purchase product.
@@ -68,5 +73,88 @@ def delete_one(purchase_product):
     if purchase.status == "active":
         raise ValidationError(f"Cannot delete products from an active purchase.") 
 
-    purchase_product.delete()  # this should trigger the signal to recalculate purchase total
+    purchase_product.delete()  # this schedules the purchase total recalculation via signal
 
+
+@transaction.atomic
+def bulk_upsert(shop, data):
+    """
+    Adds or updates many purchase products at once.
+    Stock is checked for all products in one query, lines are written with
+    bulk_create/bulk_update and the purchase summary is moved once by the summed line deltas.
+    Returns the purchase, the written purchase products and a list of per-line errors.
+    """
+    purchase = Purchase.objects.select_related("coupon").get(id=data["purchase_id"], shop=shop)
+    if purchase.status == "active":
+        raise ValidationError(f"Cannot add products to an active purchase.")
+
+    set_quantity = data.get("mode", "add") == "set"
+
+    # merge repeated products, keeping the index of their last occurrence for error reporting
+    lines = {}
+    for index, line in enumerate(data["lines"]):
+        merged = lines.get(line["product_id"])
+        if merged and not set_quantity:
+            line = {**line, "quantity": merged["quantity"] + line["quantity"]}
+        lines[line["product_id"]] = {**line, "index": index}
+
+    products = annotate_available_stock(
+        Product.objects.filter(shop=shop, id__in=lines), exclude_purchase=purchase
+    ).in_bulk()
+    existing = {
+        pp.product_id: pp
+        for pp in PurchaseProduct.objects.filter(purchase=purchase, product_id__in=lines)
+    }
+
+    errors = []
+    to_create = []
+    to_update = []
+    for product_id, line in lines.items():
+        product = products.get(product_id)
+        if product is None:
+            errors.append({"index": line["index"], "product_id": product_id, "error": "Product not found."})
+            continue
+
+        purchase_product = existing.get(product_id)
+        quantity = line["quantity"]
+        if purchase_product and not set_quantity:
+            quantity += purchase_product.quantity
+
+        if product.available_stock < quantity:
+            errors.append({
+                "index": line["index"],
+                "product_id": product_id,
+                "error": f"Insufficient stock for product {product.name}. Available: {product.available_stock}, Requested: {quantity}",
+            })
+            continue
+
+        if purchase_product:
+            purchase_product.quantity = quantity
+            if "price_at_purchase" in line:
+                purchase_product.price_at_purchase = line["price_at_purchase"]
+            purchase_product.updated_at = timezone.now()
+            to_update.append(purchase_product)
+        else:
+            purchase_product = PurchaseProduct(
+                purchase=purchase,
+                product=product,
+                quantity=quantity,
+                price_at_purchase=line.get("price_at_purchase", product.price),
+            )
+            to_create.append(purchase_product)
+        purchase_product.product = product
+
+    # bulk writes do not send signals, the summary is updated once below
+    PurchaseProduct.objects.bulk_create(to_create)
+    PurchaseProduct.objects.bulk_update(to_update, ["quantity", "price_at_purchase", "updated_at"])
+    if to_create or to_update:
+        subtotal_delta, items_delta = 0, 0
+        for purchase_product in to_create + to_update:
+            subtotal, items = line_delta(getattr(purchase_product, "_loaded_line", None), line_values(purchase_product))
+            subtotal_delta += subtotal
+            items_delta += items
+            purchase_product._loaded_line = line_values(purchase_product)
+        apply_summary(purchase, subtotal_delta, items_delta)
+
+    errors.sort(key=lambda error: error["index"])
+    return purchase, to_create + to_update, errors
@@ -1,20 +1,29 @@
 # cart/services/purchases_service.py
 
-from django.db import transaction
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router, transaction
 from django.utils import timezone
 from cart.models import (
     Purchase, Product, PurchaseProduct, Coupon,
-    PaymentMethod, Payment
+    PaymentMethod, Payment, ShopPaymentMethod
 )
 from cart.services.purchase_products_service import create as create_purchase_product
 from cart.services.customers_service import find_or_create as find_or_create_customer
-from cart.services.addresses_service import create as create_address
-from cart.services.coupons_service import validate as validate_coupon
+from cart.services.addresses_service import find_or_create as find_or_create_address
+from cart.services.coupons_service import (
+    validate as validate_coupon, get_coupon, redeem as redeem_coupon, release as release_coupon
+)
 from cart.services.payments_service.loader import get_gateway
+from cart.services.products_service import decrement_stock, available_stock
+from cart.services import catalog_service, reservations_service
+from cart.services.totals_service import coalesce_totals
 from django.core.exceptions import ValidationError
 
 
 @transaction.atomic
+@coalesce_totals()
 def create(shop, data):
     """
     Creates a new purchase for the given shop and links a purchase product to it.
@@ -23,8 +32,7 @@ def create(shop, data):
         shop=shop,
         status="draft",
     )
-    purchase.save()
-    
+
     product_data = data.get("product")
     purchase_product_data = {
         "product_id": product_data["product_id"],
@@ -36,6 +44,7 @@ def create(shop, data):
     return purchase
 
 @transaction.atomic
+@coalesce_totals()
 def update_one(purchase, data):
     """
     Update purchase details like customer, address, and status.
@@ -43,6 +52,8 @@ def update_one(purchase, data):
     customer_id = handle_customer_attachment(purchase, data.get("customer"))
     
     handle_address_attachment(purchase, customer_id, data.get("address"))
+    if data.get("status") == "cancelled":
+        return cancel(purchase)
     if data.get("status"):
         purchase.status = data["status"]
     
@@ -70,53 +81,34 @@ def handle_address_attachment(purchase, customer_id, address_data):
         return
 
     address_data["customer_id"] = customer_id
-    address = create_address(address_data)
+    # returning customers sending the same address reuse it
+    address = find_or_create_address(address_data)
     purchase.address = address
 
 @transaction.atomic
+@coalesce_totals()
 def apply_coupon(purchase, coupon_code):
     """
     Apply a valid coupon to the purchase.
     """
 
     validate_coupon(purchase, coupon_code)
-    coupon = Coupon.objects.get(shop=purchase.shop, code=coupon_code, is_active=True)
+    coupon = get_coupon(purchase.shop, coupon_code)
     purchase.coupon = coupon
-    purchase.save() # will trigger total calculation via signal
+    purchase.save() # will schedule total calculation via signal
     return purchase
 
 
 @transaction.atomic
+@coalesce_totals()
 def remove_coupon(purchase):
     """
     Removes coupon from a purchase.
     """
     purchase.coupon = None
-    purchase.save() # will trigger total calculation via signal
+    purchase.save() # will schedule total calculation via signal
     return purchase
 
-def calculate_total(purchase):
-    """
-    Utility function to calculate total purchase amount.
-    """
-    if purchase.status != "draft":
-        return
-
-    purchase_products = purchase.purchase_products.all()
-    subtotal = sum(pp.quantity * pp.price_at_purchase for pp in purchase_products)
-    discount = 0
-
-    if purchase.coupon:
-        coupon = purchase.coupon
-        if coupon.discount_type == "percent":
-            discount = subtotal * (coupon.discount_value / 100)
-        elif coupon.discount_type == "fixed":
-            discount = coupon.discount_value
-
-    total_amount = max(subtotal - discount, 0)
-    Purchase.objects.filter(pk=purchase.pk).update(total_amount=total_amount)
-    purchase.refresh_from_db()  # Refresh the instance to get updated total_amount
-
 def initialize_payment(purchase, shop_payment_method_id):
     """
     Utility function to initiate payment.
@@ -125,13 +117,20 @@ def initialize_payment(purchase, shop_payment_method_id):
     ## valiate purchase before online payment
     validate(purchase)
 
-    shop_payment_method = purchase.shop.payment_methods.get(
-        id=shop_payment_method_id
-    )
+    shop_payment_method = purchase.shop.payment_methods.select_related(
+        "gateway_payment_method__gateway", "gateway_payment_method__payment_method"
+    ).get(id=shop_payment_method_id)
     payment_gateway = get_gateway(shop_payment_method)
 
     payment_method = shop_payment_method.gateway_payment_method.payment_method
-    transaction_reference = payment_gateway.initialize_payment(purchase, payment_method)
+
+    # hold stock so the products cannot sell out before the gateway calls back
+    reservations_service.reserve(purchase)
+    try:
+        transaction_reference = payment_gateway.initialize_payment(purchase, payment_method)
+    except Exception:
+        reservations_service.release(purchase)
+        raise
 
     payment = Payment.objects.filter(purchase=purchase, status="pending").first()
 
@@ -148,41 +147,125 @@ def initialize_payment(purchase, shop_payment_method_id):
         ) 
     return {"success": True, "message": "Payment was successfully initialized"}
 
+async def ainitialize_payment(purchase, shop_payment_method_id):
+    """
+    Async variant of initialize_payment for the ASGI endpoints.
+    No worker thread is held while waiting on the gateway.
+    """
+    await sync_to_async(validate)(purchase)
+
+    shop_payment_method = await ShopPaymentMethod.objects.select_related(
+        "gateway_payment_method__gateway", "gateway_payment_method__payment_method"
+    ).aget(shop_id=purchase.shop_id, id=shop_payment_method_id)
+    payment_gateway = get_gateway(shop_payment_method)
+
+    payment_method = shop_payment_method.gateway_payment_method.payment_method
+
+    await sync_to_async(reservations_service.reserve)(purchase)
+    try:
+        transaction_reference = await payment_gateway.ainitialize_payment(purchase, payment_method)
+    except Exception:
+        await sync_to_async(reservations_service.release)(purchase)
+        raise
+
+    payment = await Payment.objects.filter(purchase=purchase, status="pending").afirst()
+
+    if payment:
+        payment.transaction_reference = transaction_reference
+        payment.shop_payment_method = shop_payment_method
+        await payment.asave()
+    else:
+        payment = await Payment.objects.acreate(
+            status="pending",
+            shop_payment_method=shop_payment_method,
+            purchase=purchase,
+            transaction_reference=transaction_reference,
+        )
+    return {"success": True, "message": "Payment was successfully initialized"}
+
 def handle_payment_webhook(purchase, data):
     """
     Utility function to handle payment gateway webhooks.
     """
-    payment = Payment.objects.get(purchase=purchase, status="pending")
+    payment = Payment.objects.select_related(
+        "shop_payment_method__gateway_payment_method__gateway"
+    ).filter(purchase=purchase, status="pending").order_by("-created_at").first()
+    if not payment:
+        # duplicate delivery of an already handled webhook
+        paid = Payment.objects.filter(purchase=purchase, status="paid").exists()
+        return {"success": paid, "duplicate": True}
     shop_payment_method = payment.shop_payment_method
     payment_gateway = get_gateway(shop_payment_method)
 
     success = payment_gateway.handle_webhook(purchase, data)
-    if success:
-        payment.status = "paid"
-        activate(purchase)
-    else:
+    if not success:
         payment.status = "failed"
+        payment.save()
+        reservations_service.release(purchase)
+        return {"success": False}
 
+    # the money is captured: stored before activating, whose failure rolls back its own changes only
+    payment.status = "paid"
     payment.save()
-    return {"success": success}
+    try:
+        activate(purchase)
+    except ValidationError as e:
+        payment.status = "needs_review"
+        payment.save()
+        reservations_service.release(purchase)
+        return {"success": True, "activated": False, "needs_review": True, "errors": e.messages}
+    return {"success": True}
 
 @transaction.atomic
+@coalesce_totals()
 def activate(purchase):
     """
     Finalizes purchase and creates a Payment record.
     """
     validate(purchase)
-    
-    for pp in purchase.purchase_products.all():
-        product = pp.product
-        product.stock -= pp.quantity
-        product.save()
+
+    purchase_products = list(purchase.purchase_products.select_related("product"))
+    quantities = {}
+    for pp in purchase_products:
+        quantities[pp.product_id] = quantities.get(pp.product_id, 0) + pp.quantity
+
+    # single guarded UPDATE, concurrent checkouts cannot oversell a product
+    failed_product_ids = decrement_stock(quantities, purchase=purchase)
+    if failed_product_ids:
+        raise ValidationError([
+            ValidationError(
+                f"Product {pp.product.name} has insuffecient quantity.",
+                code="insufficient_stock",
+                params={"purchase_product_id": pp.id, "product_id": pp.product_id},
+            )
+            for pp in purchase_products if pp.product_id in failed_product_ids
+        ])
+    # the holds are now real decrements
+    reservations_service.release(purchase)
+    # stock changed through a queryset update, which sends no Product signal;
+    # bumped after commit so concurrent checkouts do not queue on the shop row
+    catalog_service.bump_on_commit(purchase.shop_id)
+    redeem_coupon(purchase)
 
     purchase.status = "active"
     purchase.save()
     purchase.refresh_from_db()
     return purchase
 
+@transaction.atomic
+def cancel(purchase):
+    """
+    Cancels a purchase, giving back its stock holds and, once placed, its coupon redemption.
+    """
+    if purchase.status == "cancelled":
+        return purchase
+    if purchase.status != "draft":
+        release_coupon(purchase)
+    reservations_service.release(purchase)
+    purchase.status = "cancelled"
+    purchase.save()
+    return purchase
+
 def validate(purchase):
     """
     Validates that the purchase is ready to be activated.
@@ -199,9 +282,11 @@ def validate(purchase):
     if purchase.total_amount <= 0:
         raise ValidationError("Purchase total amount must be greater than zero.")
     
-    for pp in purchase.purchase_products.all():
+    purchase_products = list(purchase.purchase_products.select_related("product"))
+    available = available_stock([pp.product_id for pp in purchase_products], exclude_purchase=purchase)
+    for pp in purchase_products:
         product = pp.product
-        if product.stock < pp.quantity:
+        if available[product.id] < pp.quantity:
             raise ValidationError(f"Product {pp.product.name} has insuffecient quantity.")
 
         if product.price != pp.price_at_purchase:
@@ -214,4 +299,33 @@ def validate(purchase):
         if purchase.updated_at < purchase.coupon.updated_at:
             purchase.save()
             raise ValidationError(f"Coupon has been modifed; please re-check your total amount before proceeding.")
- 
+
+
+def delete_abandoned_drafts(after_id=0, batch_size=1000):
+    """
+    Deletes one batch of drafts (by id, after after_id) not updated for DRAFT_PURCHASE_TTL seconds.
+    Drafts with stored payment webhooks are kept, their payment may have gone through.
+    Returns the last deleted id (None when there is nothing left) and the number of rows deleted per model.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.DRAFT_PURCHASE_TTL)
+    using = router.db_for_write(Purchase)
+    with transaction.atomic(using=using):
+        # rows locked by a request still writing to the cart are left for the next run
+        ids = list(
+            Purchase.objects.select_for_update(skip_locked=True)
+            .filter(pk__gt=after_id, status="draft", updated_at__lte=cutoff)
+            .exclude(webhook_events__isnull=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return None, {}
+
+        # raw deletes: no instances are loaded and no per row signals run (the drafts are gone,
+        # their totals need no recalculation)
+        deleted = {}
+        for relation in Purchase._meta.related_objects:
+            queryset = relation.related_model._base_manager.using(using).filter(**{f"{relation.field.name}__in": ids})
+            deleted[relation.related_model._meta.label] = queryset._raw_delete(using)
+        deleted[Purchase._meta.label] = Purchase._base_manager.using(using).filter(pk__in=ids)._raw_delete(using)
+    return ids[-1], deleted
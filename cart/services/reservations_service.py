@@ -0,0 +1,55 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from cart.models import Product, StockReservation
+from cart.services.products_service import available_stock
+from django.core.exceptions import ValidationError
+
+
+@transaction.atomic
+def reserve(purchase):
+    """
+    Holds the purchase quantities until the online payment completes or the hold expires.
+    Replaces any previous holds of the purchase and returns their expiry.
+    """
+    quantities = {}
+    purchase_products = list(purchase.purchase_products.select_related("product"))
+    for pp in purchase_products:
+        quantities[pp.product_id] = quantities.get(pp.product_id, 0) + pp.quantity
+
+    # rows are only locked for this check, never across the gateway call
+    list(Product.objects.select_for_update().filter(pk__in=quantities).order_by("pk").values_list("pk", flat=True))
+    available = available_stock(quantities, exclude_purchase=purchase)
+    for pp in purchase_products:
+        if available.get(pp.product_id, 0) < quantities[pp.product_id]:
+            raise ValidationError(f"Product {pp.product.name} has insuffecient quantity.")
+
+    expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    StockReservation.objects.filter(purchase=purchase).delete()
+    StockReservation.objects.bulk_create([
+        StockReservation(purchase=purchase, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in quantities.items()
+    ])
+    return expires_at
+
+def release(purchase):
+    """
+    Releases all holds of the purchase (payment failed, or stock was decremented on activation).
+    """
+    StockReservation.objects.filter(purchase=purchase).delete()
+
+def release_expired(batch_size=1000):
+    """
+    Deletes one batch of expired holds and returns the number of rows deleted.
+    Expired holds are already ignored by stock checks, this only keeps the table small.
+    """
+    ids = list(
+        StockReservation.objects.filter(expires_at__lte=timezone.now())
+        .order_by("expires_at")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    deleted, _ = StockReservation.objects.filter(id__in=ids).delete()
+    return deleted
@@ -0,0 +1,53 @@
+import copy
+from django.conf import settings
+from cart.cache import TTLCache, MISSING
+from cart.models import Shop
+
+# Marker stored for hosts that do not belong to any shop (negative cache)
+UNKNOWN_SHOP = object()
+
+shop_cache = TTLCache(
+    max_size=getattr(settings, "SHOP_CACHE_MAX_SIZE", 1024),
+    ttl=getattr(settings, "SHOP_CACHE_TTL", 300),
+)
+
+def get_by_domain(host):
+    """
+    Resolves the shop for the given host, hitting the database only on a cache miss.
+    Returns None if no shop owns this domain.
+    """
+    shop = shop_cache.get(host)
+    if shop is MISSING:
+        shop = _store(host, Shop.objects.filter(domain=host).first())
+    return _resolved(shop)
+
+async def aget_by_domain(host):
+    """Async variant of get_by_domain, cache hits never leave the event loop."""
+    shop = shop_cache.get(host)
+    if shop is MISSING:
+        shop = _store(host, await Shop.objects.filter(domain=host).afirst())
+    return _resolved(shop)
+
+def _store(host, shop):
+    if shop is None:
+        shop_cache.set(host, UNKNOWN_SHOP, ttl=getattr(settings, "SHOP_NEGATIVE_CACHE_TTL", 30))
+        return UNKNOWN_SHOP
+    shop_cache.set(host, shop)
+    return shop
+
+def _resolved(shop):
+    if shop is UNKNOWN_SHOP:
+        return None
+    # each request gets its own copy so per-request state never leaks between requests
+    return copy.copy(shop)
+
+def invalidate(shop):
+    """
+    Drops cached entries for the shop, including the one under its old domain
+    and any negative entry for its current domain.
+    """
+    shop_cache.delete(shop.domain)
+    shop_cache.delete_where(lambda cached: cached is not UNKNOWN_SHOP and cached.pk == shop.pk)
+
+def cache_stats():
+    return shop_cache.stats()
@@ -0,0 +1,250 @@
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from contextlib import contextmanager
+from django.db.models import DecimalField, F, IntegerField, Sum, Value
+from django.db.models.functions import Coalesce, Least, Round
+from django.utils import timezone
+from cart.models import Purchase, PurchaseProduct
+
+_state = threading.local()
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+def _get_state():
+    if not hasattr(_state, "depth"):
+        _state.depth = 0
+        _state.suppressed = 0
+        _state.pending = {}
+    return _state
+
+@contextmanager
+def coalesce_totals():
+    """
+    Collects total recalculations requested inside the block and runs each purchase's
+    recalculation once when the outermost block exits (inside the caller's transaction).
+    Can be used as a decorator on service functions.
+    """
+    state = _get_state()
+    state.depth += 1
+    try:
+        yield
+    except BaseException:
+        if state.depth == 1:
+            state.pending = {}
+        raise
+    finally:
+        state.depth -= 1
+
+    if state.depth == 0:
+        pending, state.pending = state.pending, {}
+        for purchase_id, change in pending.items():
+            instances = change["instances"]
+            purchase = instances[-1] if instances else Purchase.objects.select_related("coupon").filter(pk=purchase_id).first()
+            if purchase is None:
+                continue
+            if change["recalculate"]:
+                calculate_total(purchase)
+            else:
+                apply_summary(purchase, change["subtotal"], change["items"])
+            for instance in instances:
+                for field in ("subtotal", "discount", "item_count", "total_amount"):
+                    setattr(instance, field, getattr(purchase, field))
+
+@contextmanager
+def suppress_totals():
+    """
+    Disables signal driven total recalculation inside the block.
+    Bulk code paths use it and call calculate_total once themselves.
+    """
+    state = _get_state()
+    state.suppressed += 1
+    try:
+        yield
+    finally:
+        state.suppressed -= 1
+
+def schedule_total(purchase_id, purchase=None, subtotal_delta=ZERO, items_delta=0, recalculate=False):
+    """
+    Requests a summary update for a purchase, moving its subtotal and item count by the given deltas
+    (or recomputing it from all lines with recalculate=True).
+    Deferred and merged per purchase inside coalesce_totals, immediate otherwise.
+    """
+    state = _get_state()
+    if state.suppressed:
+        return
+
+    if state.depth:
+        change = state.pending.setdefault(
+            purchase_id, {"instances": [], "subtotal": ZERO, "items": 0, "recalculate": False}
+        )
+        if purchase is not None and all(purchase is not instance for instance in change["instances"]):
+            change["instances"].append(purchase)
+        change["subtotal"] += subtotal_delta
+        change["items"] += items_delta
+        change["recalculate"] = change["recalculate"] or recalculate
+        return
+
+    if purchase is None:
+        # the purchase may be gone already when its lines are cascade deleted
+        purchase = Purchase.objects.select_related("coupon").filter(pk=purchase_id).first()
+        if purchase is None:
+            return
+    if recalculate:
+        calculate_total(purchase)
+    else:
+        apply_summary(purchase, subtotal_delta, items_delta)
+
+def line_values(purchase_product):
+    return (purchase_product.purchase_id, purchase_product.quantity, purchase_product.price_at_purchase)
+
+def line_delta(old, new):
+    """Subtotal and item count change between two (purchase_id, quantity, price) line values of the same purchase."""
+    old_amount = old[1] * Decimal(str(old[2])) if old else ZERO
+    new_amount = new[1] * Decimal(str(new[2])) if new else ZERO
+    return new_amount - old_amount, (new[1] if new else 0) - (old[1] if old else 0)
+
+def schedule_line_change(purchase_product, purchase=None, created=False, deleted=False):
+    """
+    Schedules the summary change caused by saving or deleting a line,
+    from the difference with the line as it was loaded.
+    """
+    loaded = None if created else getattr(purchase_product, "_loaded_line", None)
+    current = line_values(purchase_product)
+    if loaded is None and not created:
+        if not deleted:
+            # loaded without its amounts (e.g. only()), the delta is unknown
+            schedule_total(purchase_product.purchase_id, purchase, recalculate=True)
+            purchase_product._loaded_line = current
+            return
+        loaded = current
+
+    new = None if deleted else current
+    if loaded and new and loaded[0] != new[0]:
+        # the line moved to another purchase
+        schedule_total(loaded[0], None, *line_delta(loaded, None))
+        loaded = None
+    if loaded or new:
+        schedule_total(purchase_product.purchase_id, purchase, *line_delta(loaded, new))
+    purchase_product._loaded_line = new
+
+def _discount(coupon, subtotal):
+    if coupon is None:
+        return ZERO
+    if coupon.discount_type == "percent":
+        discount = (subtotal * Decimal(str(coupon.discount_value)) / 100).quantize(CENT, ROUND_HALF_UP)
+    elif coupon.discount_type == "fixed":
+        discount = Decimal(str(coupon.discount_value))
+    else:
+        return ZERO
+    return min(discount, subtotal)
+
+def _discount_expression(coupon, subtotal):
+    """Same as _discount, computed by the database from a subtotal expression."""
+    if coupon is None or coupon.discount_type not in ("percent", "fixed"):
+        return Value(ZERO, output_field=MONEY)
+    if coupon.discount_type == "percent":
+        rate = Value(Decimal(str(coupon.discount_value)) / 100, output_field=DecimalField(max_digits=12, decimal_places=6))
+        discount = Round(subtotal * rate, 2, output_field=MONEY)
+    else:
+        discount = Value(Decimal(str(coupon.discount_value)), output_field=MONEY)
+    return Least(discount, subtotal, output_field=MONEY)
+
+def apply_summary(purchase, subtotal_delta=ZERO, items_delta=0):
+    """
+    Moves the purchase's subtotal and item count by the given deltas and derives discount and total
+    from the new subtotal in a single UPDATE, whatever the number of lines.
+    The increments are applied by the database so concurrent edits of the same cart are not lost,
+    the instance gets the same values computed from what it had loaded.
+    Without deltas (a coupon or status change) the instance is first refreshed, it may predate other edits.
+    """
+    subtotal_delta = Decimal(str(subtotal_delta))
+    draft = purchase.status == "draft"
+    if not subtotal_delta and not items_delta:
+        if not draft:
+            return
+        purchase.subtotal, purchase.item_count = (
+            Purchase.objects.filter(pk=purchase.pk).values_list("subtotal", "item_count").get()
+        )
+
+    subtotal = F("subtotal") + Value(subtotal_delta, output_field=MONEY)
+    purchase.subtotal = Decimal(str(purchase.subtotal)) + subtotal_delta
+    purchase.item_count += items_delta
+    updates = {}
+    if draft:
+        # totals of placed purchases are final
+        discount = _discount_expression(purchase.coupon, subtotal)
+        updates["total_amount"] = subtotal - discount
+        updates["discount"] = discount
+        purchase.discount = _discount(purchase.coupon, purchase.subtotal)
+        purchase.total_amount = purchase.subtotal - purchase.discount
+    updates["subtotal"] = subtotal
+    updates["item_count"] = F("item_count") + items_delta
+    # queryset updates skip auto_now, updated_at versions the purchase for ETags
+    purchase.updated_at = updates["updated_at"] = timezone.now()
+    Purchase.objects.filter(pk=purchase.pk).update(**updates)
+
+def calculate_total(purchase, purchase_products=None):
+    """
+    Recomputes the purchase summary from all of its lines.
+    Uses purchase_products when the caller already has the lines loaded, otherwise aggregates in the database.
+    Line edits go through apply_summary, this is the full recompute verify_summaries checks against.
+    """
+    if purchase_products is not None:
+        subtotal = sum((line_delta(None, line_values(pp))[0] for pp in purchase_products), ZERO)
+        item_count = sum(pp.quantity for pp in purchase_products)
+    else:
+        aggregates = _line_aggregates(purchase.purchase_products.all())
+        subtotal, item_count = aggregates["subtotal"], aggregates["item_count"]
+
+    purchase.subtotal = Decimal(subtotal).quantize(CENT)
+    purchase.item_count = item_count
+    updates = {}
+    if purchase.status == "draft":
+        purchase.discount = _discount(purchase.coupon, purchase.subtotal)
+        purchase.total_amount = purchase.subtotal - purchase.discount
+        updates = {"total_amount": purchase.total_amount, "discount": purchase.discount}
+    purchase.updated_at = timezone.now()
+    Purchase.objects.filter(pk=purchase.pk).update(
+        **updates, subtotal=purchase.subtotal, item_count=item_count, updated_at=purchase.updated_at
+    )
+
+def _line_aggregates(purchase_products):
+    return purchase_products.aggregate(
+        subtotal=Coalesce(Sum(F("quantity") * F("price_at_purchase"), output_field=MONEY), Value(ZERO), output_field=MONEY),
+        item_count=Coalesce(Sum("quantity"), Value(0), output_field=IntegerField()),
+    )
+
+def verify_summaries(after_id=0, batch_size=1000, fix=False):
+    """
+    Checks one batch of purchases (by id, after after_id) against a full recompute of their lines.
+    Returns the last checked id (None when there is nothing left) and the ids of mismatched purchases,
+    which are recomputed when fix is set.
+    """
+    purchases = list(
+        Purchase.objects.select_related("coupon").filter(pk__gt=after_id).order_by("pk")[:batch_size]
+    )
+    if not purchases:
+        return None, []
+
+    expected = {
+        row["purchase_id"]: row
+        for row in PurchaseProduct.objects.filter(purchase__in=purchases)
+        .values("purchase_id")
+        .annotate(subtotal=Sum(F("quantity") * F("price_at_purchase"), output_field=MONEY), item_count=Sum("quantity"))
+    }
+    mismatched = []
+    for purchase in purchases:
+        row = expected.get(purchase.pk, {"subtotal": ZERO, "item_count": 0})
+        subtotal = Decimal(row["subtotal"]).quantize(CENT)
+        discount = _discount(purchase.coupon, subtotal)
+        if (
+            purchase.subtotal != subtotal
+            or purchase.item_count != row["item_count"]
+            or purchase.status == "draft" and (purchase.discount != discount or purchase.total_amount != subtotal - discount)
+        ):
+            mismatched.append(purchase.pk)
+            if fix:
+                calculate_total(purchase)
+    return purchases[-1].pk, mismatched
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from cart.models import Payment, PaymentWebhookEvent
+from cart.services.purchases_service import handle_payment_webhook
+from django.core.exceptions import ValidationError
+
+
+def _pending_reference(purchase):
+    return (
+        Payment.objects.filter(purchase=purchase, status="pending")
+        .order_by("-created_at")
+        .values_list("transaction_reference", flat=True)
+    )
+
+def _event_key(purchase, data):
+    # scoped to the purchase: event ids are only unique per gateway, and a webhook posted for
+    # one purchase must not be able to claim the key of another purchase's delivery
+    event_id = data.get("event_id") or data.get("id")
+    return f"event:{purchase.id}:{event_id}" if event_id else None
+
+def dedup_key(purchase, data):
+    """
+    Key identifying a webhook delivery: the purchase and the gateway event id when sent,
+    otherwise the purchase's transaction reference.
+    """
+    key = _event_key(purchase, data)
+    if key:
+        return key
+    reference = data.get("transaction_reference") or _pending_reference(purchase).first()
+    return f"reference:{purchase.id}:{reference}"
+
+def enqueue(purchase, data):
+    """
+    Stores the webhook in the inbox to be processed by the worker.
+    Returns the event and whether it was already received (a retry from the gateway).
+    """
+    event, created = PaymentWebhookEvent.objects.get_or_create(
+        dedup_key=dedup_key(purchase, data),
+        defaults={"purchase": purchase, "payload": data},
+    )
+    return event, not created
+
+async def aenqueue(purchase, data):
+    """Async variant of enqueue for the ASGI endpoints."""
+    key = _event_key(purchase, data)
+    if not key:
+        reference = data.get("transaction_reference") or await _pending_reference(purchase).afirst()
+        key = f"reference:{purchase.id}:{reference}"
+    event, created = await PaymentWebhookEvent.objects.aget_or_create(
+        dedup_key=key,
+        defaults={"purchase": purchase, "payload": data},
+    )
+    return event, not created
+
+def process_pending(batch_size=100):
+    """
+    Processes one batch of pending webhook events and returns how many were handled.
+    Locked rows are skipped, so several workers can run side by side.
+    """
+    max_attempts = settings.PAYMENT_WEBHOOK_MAX_ATTEMPTS
+    with transaction.atomic():
+        events = list(
+            PaymentWebhookEvent.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("purchase__shop", "purchase__customer", "purchase__address", "purchase__coupon")
+            .filter(status="pending")
+            .order_by("created_at")[:batch_size]
+        )
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    event.result = handle_payment_webhook(event.purchase, event.payload)
+                event.status = "processed"
+                event.last_error = ""
+            except ValidationError as e:
+                # business rule failures will not succeed on a retry
+                event.status = "failed"
+                event.last_error = "; ".join(e.messages)
+            except Exception as e:
+                event.status = "failed" if event.attempts >= max_attempts else "pending"
+                event.last_error = str(e)
+            event.processed_at = timezone.now()
+
+        PaymentWebhookEvent.objects.bulk_update(events, ["status", "attempts", "last_error", "result", "processed_at"])
+    return len(events)
+
+def needs_review_count():
+    """Payments captured by the gateway for purchases that could not be activated."""
+    return Payment.objects.filter(status="needs_review").count()
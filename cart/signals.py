@@ -1,16 +1,87 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from cart.models import Purchase, PurchaseProduct
-from cart.services.purchases_service import calculate_total
+from django.utils import timezone
+from cart.models import Shop, Customer, Address, Coupon, Product, Purchase, PurchaseProduct, Payment, PaymentGateway, ShopPaymentMethod
+from cart.services.totals_service import schedule_total, schedule_line_change
+from cart.services import shops_service, coupons_service, catalog_service
+from cart.services.payments_service import loader as gateway_loader
+from cart import metrics
+
+def _cached_purchase(purchase_product):
+    # avoid loading the purchase only to schedule its recalculation
+    if PurchaseProduct.purchase.is_cached(purchase_product):
+        return purchase_product.purchase
+    return None
 
 @receiver(post_save, sender=Purchase)
 def after_purchase_saved(sender, instance, **kwargs):
-    calculate_total(instance)
+    schedule_total(instance.pk, instance)
     
 @receiver(post_save, sender=PurchaseProduct)
-def after_purchase_saved(sender, instance, **kwargs):
-    calculate_total(instance.purchase)
+def after_purchase_product_saved(sender, instance, created, **kwargs):
+    schedule_line_change(instance, _cached_purchase(instance), created=created)
 
 @receiver(post_delete, sender=PurchaseProduct)
 def after_purchase_product_deleted(sender, instance, **kwargs):
-    calculate_total(instance.purchase)
+    schedule_line_change(instance, _cached_purchase(instance), deleted=True)
+
+@receiver(post_save, sender=Payment)
+def after_payment_saved(sender, instance, **kwargs):
+    # payments are rendered with the purchase, a new version invalidates its ETag
+    Purchase.objects.filter(pk=instance.purchase_id).update(updated_at=timezone.now())
+
+def _touch_drafts(**filters):
+    # rendered with the draft purchases, a new version invalidates their ETag
+    Purchase.objects.filter(status="draft", **filters).update(updated_at=timezone.now())
+
+@receiver(post_save, sender=Customer)
+def after_customer_saved(sender, instance, **kwargs):
+    _touch_drafts(customer=instance)
+
+@receiver(post_save, sender=Address)
+def after_address_saved(sender, instance, **kwargs):
+    _touch_drafts(address=instance)
+
+@receiver(pre_delete, sender=Address)
+def before_address_deleted(sender, instance, **kwargs):
+    # SET_NULL clears the purchases' address with an update that leaves updated_at alone
+    _touch_drafts(address=instance)
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def after_shop_changed(sender, instance, **kwargs):
+    shops_service.invalidate(instance)
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def after_product_changed(sender, instance, **kwargs):
+    catalog_service.bump(instance.shop_id)
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def after_coupon_changed(sender, instance, **kwargs):
+    coupons_service.invalidate(instance)
+
+@receiver(post_save, sender=Coupon)
+def after_coupon_saved(sender, instance, **kwargs):
+    _touch_drafts(coupon=instance)
+
+@receiver(pre_delete, sender=Coupon)
+def before_coupon_deleted(sender, instance, **kwargs):
+    _touch_drafts(coupon=instance)
+
+@receiver(post_save, sender=ShopPaymentMethod)
+@receiver(post_delete, sender=ShopPaymentMethod)
+def after_shop_payment_method_changed(sender, instance, **kwargs):
+    gateway_loader.invalidate(instance.id)
+
+@receiver(post_save, sender=PaymentGateway)
+@receiver(post_delete, sender=PaymentGateway)
+def after_payment_gateway_changed(sender, instance, **kwargs):
+    gateway_loader.invalidate()
+
+@receiver(connection_created)
+def after_connection_created(sender, connection, **kwargs):
+    # count and time the queries of requests handled by MetricsMiddleware
+    metrics.instrument(connection)
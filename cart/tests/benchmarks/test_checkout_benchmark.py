@@ -0,0 +1,196 @@
+"""
+Query count and latency benchmarks for the checkout API.
+
+Every step of the checkout flow is driven through the API for carts of
+different sizes. Query counts and p50/p95 latencies are compared against
+baseline.json: the run fails when a step needs more queries than recorded
+there, or when its p50 is slower than the recorded one by more than the
+latency tolerance (p95 is recorded too, with few repeats it is the slowest
+run and too noisy to gate on). Latencies depend on the machine, refresh
+the baseline on the one running the comparison.
+
+    BENCHMARK_CART_SIZES=1,10,100   cart sizes to run
+    BENCHMARK_REPEATS=5             runs per cart size, used for p50/p95
+    BENCHMARK_LATENCY_TOLERANCE=2   allowed p50 slowdown factor
+    BENCHMARK_UPDATE_BASELINE=1     rewrite baseline.json with the current counts and latencies
+    BENCHMARK_RESULTS=path.json     also write the full results (with timings) to a file
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from cart.models import Address, Payment, Product
+from cart.services import purchases_service, webhooks_service
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+CART_SIZES = [int(size) for size in os.getenv("BENCHMARK_CART_SIZES", "1,10,100").split(",")]
+REPEATS = int(os.getenv("BENCHMARK_REPEATS", "5"))
+LATENCY_TOLERANCE = float(os.getenv("BENCHMARK_LATENCY_TOLERANCE", "2"))
+# steps faster than this are within timer and scheduler noise, their latency is not compared
+LATENCY_FLOOR_MS = 5
+ADDRESSES_PER_CUSTOMER = 50
+PAYMENTS_PER_PURCHASE = 20
+
+CUSTOMER = {"name": "Bench Customer", "email": "bench@example.com", "phone": "0100000000"}
+ADDRESS = {"line1": "1 Bench St", "city": "Cairo", "region": "Cairo", "country": "Egypt", "postal_code": "12345"}
+
+results = {}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return round(values[round(fraction * (len(values) - 1))], 3)
+
+
+def measure(scenario, step, func):
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        response = func()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    if hasattr(response, "status_code"):
+        assert response.status_code < 300, (step, response.status_code, response.content)
+
+    entry = results.setdefault(scenario, {}).setdefault(step, {"queries": 0, "timings": []})
+    # the last run wins, earlier ones include cold caches
+    entry["queries"] = len(ctx.captured_queries)
+    entry["timings"].append(elapsed_ms)
+    return response
+
+
+@pytest.fixture
+def client(shop):
+    return APIClient(HTTP_HOST=shop.domain)
+
+
+@pytest.fixture
+def catalog(shop):
+    return Product.objects.bulk_create([
+        Product(shop=shop, name=f"Product {i}", sku=f"SKU-{i}", price=10 + i, stock=1_000_000)
+        for i in range(max(CART_SIZES))
+    ])
+
+
+@pytest.fixture
+def checkout_setup(shop, customer, catalog, payment_setup):
+    shop.coupons.create(code="BENCH10", discount_type="percent", discount_value=10, is_active=True)
+    bench_customer = shop.customers.create(**CUSTOMER)
+    Address.objects.bulk_create([
+        Address(customer=bench_customer, line1=f"{i} Bench St", city="Cairo", region="Cairo", country="Egypt")
+        for i in range(ADDRESSES_PER_CUSTOMER)
+    ])
+    return payment_setup["shop_payment_method"]
+
+
+def cart_lines(catalog, size):
+    return [{"product_id": product.id, "quantity": 1} for product in catalog[:size]]
+
+
+def create_cart(client, catalog, size, scenario):
+    response = measure(scenario, "create", lambda: client.post(
+        "/api/purchases/", {"product": {"product_id": catalog[0].id, "quantity": 1}}, format="json"
+    ))
+    purchase_id = response.json()["id"]
+    measure(scenario, "add_lines", lambda: client.post(
+        "/api/purchase_products/bulk/",
+        {"purchase_id": purchase_id, "mode": "set", "lines": cart_lines(catalog, size)},
+        format="json",
+    ))
+    measure(scenario, "attach_customer", lambda: client.put(
+        f"/api/purchases/{purchase_id}/", {"customer": CUSTOMER, "address": ADDRESS}, format="json"
+    ))
+    return purchase_id
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize("size", CART_SIZES)
+def test_online_checkout(client, catalog, checkout_setup, size):
+    scenario = f"online_checkout[{size}]"
+    for _ in range(REPEATS):
+        purchase_id = create_cart(client, catalog, size, scenario)
+        measure(scenario, "apply_coupon", lambda: client.post(
+            f"/api/purchases/{purchase_id}/apply_coupon/", {"coupon_code": "BENCH10"}, format="json"
+        ))
+        Payment.objects.bulk_create([
+            Payment(purchase_id=purchase_id, shop_payment_method=checkout_setup, status="failed")
+            for _ in range(PAYMENTS_PER_PURCHASE)
+        ])
+        measure(scenario, "retrieve", lambda: client.get(f"/api/purchases/{purchase_id}/"))
+        measure(scenario, "initialize_payment", lambda: client.post(
+            f"/api/purchases/{purchase_id}/initialize_payment/",
+            {"shop_payment_method_id": checkout_setup.id},
+            format="json",
+        ))
+        measure(scenario, "payment_webhook", lambda: client.post(
+            f"/api/purchases/{purchase_id}/payment_webhook/", {"webhook_data": {}}, format="json"
+        ))
+        assert measure(scenario, "process_webhooks", lambda: webhooks_service.process_pending()) == 1
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize("size", CART_SIZES)
+def test_direct_activation(client, catalog, checkout_setup, size):
+    scenario = f"direct_activation[{size}]"
+    for _ in range(REPEATS):
+        purchase_id = create_cart(client, catalog, size, scenario)
+        measure(scenario, "activate", lambda: client.post(f"/api/purchases/{purchase_id}/activate/"))
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize("size", CART_SIZES)
+def test_list_purchases(shop, client, catalog, size):
+    scenario = f"list_purchases[{size}]"
+    for product in catalog[:size]:
+        purchases_service.create(shop, {"product": {"product_id": product.id, "quantity": 1}})
+    for _ in range(REPEATS):
+        measure(scenario, "list", lambda: client.get("/api/purchases/"))
+
+
+@pytest.fixture(scope="module", autouse=True)
+def compare_with_baseline():
+    yield
+    if not results:
+        return
+
+    report = {
+        scenario: {
+            step: {
+                "queries": entry["queries"],
+                "p50_ms": percentile(entry["timings"], 0.5),
+                "p95_ms": percentile(entry["timings"], 0.95),
+            }
+            for step, entry in steps.items()
+        }
+        for scenario, steps in results.items()
+    }
+    if os.getenv("BENCHMARK_RESULTS"):
+        Path(os.getenv("BENCHMARK_RESULTS")).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    if os.getenv("BENCHMARK_UPDATE_BASELINE"):
+        for scenario, steps in report.items():
+            baseline[scenario] = steps
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        return
+
+    regressions = []
+    for scenario, steps in report.items():
+        for step, entry in steps.items():
+            recorded = baseline.get(scenario, {}).get(step)
+            if recorded is None:
+                continue
+            if entry["queries"] > recorded["queries"]:
+                regressions.append(f"{scenario} {step}: {entry['queries']} queries (baseline {recorded['queries']})")
+            allowed_ms = max(recorded.get("p50_ms", 0) * LATENCY_TOLERANCE, LATENCY_FLOOR_MS)
+            if "p50_ms" in recorded and entry["p50_ms"] > allowed_ms:
+                regressions.append(f"{scenario} {step}: p50 {entry['p50_ms']} ms (baseline {recorded['p50_ms']} ms)")
+    if regressions:
+        pytest.fail("Benchmark regressions:\n" + "\n".join(regressions), pytrace=False)
@@ -1,5 +1,23 @@
+import copy
 import pytest
+from django.db import connections
 from cart.models import Shop, Customer, Product, Purchase, Address, Coupon, PaymentGateway, PaymentMethod, GatewayPaymentMethod, ShopPaymentMethod
+from cart.services import shops_service, coupons_service, catalog_service
+from cart.services.payments_service import loader as gateway_loader
+
+# replica alias mirroring the test database, routing tests send real reads through it
+REPLICA = "test_replica"
+connections.settings.setdefault(REPLICA, {**copy.deepcopy(connections.settings["default"]), "TEST": {"MIRROR": "default"}})
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # in-process caches outlive the per-test database transaction
+    shops_service.shop_cache.clear()
+    coupons_service.coupon_cache.clear()
+    catalog_service.version_cache.clear()
+    catalog_service.response_cache.clear()
+    gateway_loader.invalidate()
+    yield
 
 @pytest.fixture
 def shop(db):
@@ -1,6 +1,7 @@
 import pytest
+from rest_framework.test import APIClient
 from cart.services import addresses_service
-from cart.models import Address
+from cart.models import Address, ArchivedPurchase, Purchase
 
 @pytest.mark.django_db
 def test_create_address_success(customer):
@@ -17,3 +18,62 @@ def test_create_address_success(customer):
     assert isinstance(address, Address)
     assert address.customer == customer
     assert address.city == "Cairo"
+
+@pytest.mark.django_db
+def test_find_or_create_reuses_identical_address(customer, address, django_assert_num_queries):
+    data = {
+        "customer_id": customer.id,
+        "line1": " 123  test st",
+        "line2": "",
+        "city": "CAIRO",
+        "region": "Cairo",
+        "country": "Egypt",
+        "postal_code": "12345",
+    }
+    with django_assert_num_queries(1):
+        assert addresses_service.find_or_create(data).id == address.id
+
+    other = addresses_service.find_or_create({**data, "line1": "124 Test St"})
+    assert other.id != address.id
+    assert other.line1 == "124 Test St"
+
+@pytest.mark.django_db
+def test_collapse_duplicates_keeps_oldest_and_repoints_purchases(shop, customer, address):
+    duplicate = Address.objects.create(customer=customer, line1="123 Test St ", city="cairo", region="Cairo", country="Egypt", postal_code="12345", is_default=True)
+    purchase = Purchase.objects.create(shop=shop, customer=customer, address=duplicate)
+    archived = ArchivedPurchase.objects.create(
+        id=purchase.id + 1, shop=shop, customer=customer, address=duplicate, status="delivered",
+        created_at=purchase.created_at, updated_at=purchase.updated_at,
+    )
+    Address.objects.filter(pk=address.pk).update(fingerprint="")
+
+    assert addresses_service.fill_fingerprints() == 1
+    assert addresses_service.collapse_duplicates() == 1
+    assert list(customer.addresses.values_list("id", "is_default")) == [(address.id, True)]
+    purchase.refresh_from_db()
+    assert purchase.address_id == address.id
+    archived.refresh_from_db()
+    assert archived.address_id == address.id
+    assert addresses_service.collapse_duplicates() == 0
+
+@pytest.mark.django_db
+def test_editing_or_deleting_address_keeps_placed_purchases_shipping_address(shop, customer, address):
+    placed = Purchase.objects.create(shop=shop, customer=customer, address=address, status="active")
+    draft = Purchase.objects.create(shop=shop, customer=customer, address=address)
+    client = APIClient(HTTP_HOST=shop.domain)
+
+    response = client.patch(f"/api/addresses/{address.id}/", {"line1": "9 New St"}, format="json")
+    assert response.status_code == 200
+    placed.refresh_from_db()
+    draft.refresh_from_db()
+    assert placed.address.line1 == "123 Test St" and placed.address.retired
+    assert draft.address_id == address.id and draft.address.line1 == "9 New St"
+    # the retired copy is not one of the customer's addresses
+    assert list(customer.addresses.values_list("id", flat=True)) == [address.id]
+
+    archived = ArchivedPurchase.objects.create(id=placed.id + 100, shop=shop, customer=customer, address=address, status="delivered", created_at=placed.created_at, updated_at=placed.updated_at)
+    assert client.delete(f"/api/addresses/{address.id}/").status_code == 204
+    archived.refresh_from_db()
+    assert archived.address.line1 == "9 New St"
+    assert Purchase.objects.get(pk=placed.pk).address.line1 == "123 Test St"
+    assert Purchase.objects.get(pk=draft.pk).address is None
@@ -0,0 +1,87 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework.test import APIClient
+from cart.models import ArchivedPayment, ArchivedPurchase, ArchivedPurchaseProduct, Payment, PaymentWebhookEvent, Purchase, PurchaseProduct
+from cart.services import archive_service
+
+def _columns(model):
+    return {field.name: type(field) for field in model._meta.concrete_fields if field.name != "id"}
+
+def _placed(shop, customer, address, product, status, days_old):
+    purchase = Purchase.objects.create(shop=shop, customer=customer, address=address, status=status)
+    purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    Purchase.objects.filter(pk=purchase.pk).update(updated_at=timezone.now() - timedelta(days=days_old))
+    return purchase
+
+def test_archive_tables_have_the_live_shape():
+    assert _columns(ArchivedPurchase).keys() == _columns(Purchase).keys()
+    assert _columns(ArchivedPurchaseProduct).keys() == _columns(PurchaseProduct).keys()
+    assert _columns(ArchivedPayment).keys() == _columns(Payment).keys()
+
+@pytest.mark.django_db
+def test_archive_moves_old_completed_purchases(shop, customer, address, product, payment_setup):
+    delivered = _placed(shop, customer, address, product, "delivered", 120)
+    Payment.objects.create(purchase=delivered, shop_payment_method=payment_setup["shop_payment_method"], status="paid")
+    # the payment write touched the purchase
+    Purchase.objects.filter(pk=delivered.pk).update(updated_at=timezone.now() - timedelta(days=120))
+    recent = _placed(shop, customer, address, product, "cancelled", 1)
+    active = _placed(shop, customer, address, product, "active", 120)
+
+    last_id, purchases, lines = archive_service.archive_completed(batch_size=10)
+    assert (last_id, purchases, lines) == (delivered.pk, 1, 1)
+    assert set(Purchase.objects.values_list("pk", flat=True)) == {recent.pk, active.pk}
+    assert not PurchaseProduct.objects.filter(purchase_id=delivered.pk).exists()
+
+    archived = ArchivedPurchase.objects.get(pk=delivered.pk)
+    assert archived.status == "delivered" and archived.created_at == delivered.created_at
+    assert archived.purchase_products.get().quantity == 2
+    assert archived.payments.get().status == "paid"
+    assert not Payment.objects.filter(purchase_id=delivered.pk).exists()
+    assert archive_service.archive_completed(last_id) == (None, 0, 0)
+
+@pytest.mark.django_db
+def test_receipt_falls_back_to_the_archive(shop, customer, address, product):
+    delivered = _placed(shop, customer, address, product, "delivered", 120)
+    active = _placed(shop, customer, address, product, "active", 0)
+    draft = Purchase.objects.create(shop=shop)
+    client = APIClient(HTTP_HOST=shop.domain)
+    before = client.get(f"/api/purchases/{delivered.pk}/receipt/").json()
+
+    archive_service.archive_completed()
+    assert client.get(f"/api/purchases/{delivered.pk}/receipt/").json() == before
+    assert client.get(f"/api/purchases/{active.pk}/receipt/").json()["status"] == "active"
+    assert client.get(f"/api/purchases/{draft.pk}/receipt/").status_code == 404
+
+@pytest.mark.django_db
+def test_purchases_with_unprocessed_webhooks_are_kept(shop, customer, address, product):
+    delivered = _placed(shop, customer, address, product, "delivered", 120)
+    PaymentWebhookEvent.objects.create(purchase=delivered, dedup_key="evt-late", status="failed")
+    assert archive_service.archive_completed() == (None, 0, 0)
+
+@pytest.mark.django_db
+def test_late_webhook_for_archived_purchase(shop, customer, address, product, payment_setup):
+    delivered = _placed(shop, customer, address, product, "delivered", 0)
+    Payment.objects.create(purchase=delivered, shop_payment_method=payment_setup["shop_payment_method"], status="paid")
+    PaymentWebhookEvent.objects.create(purchase=delivered, dedup_key="evt-1", status="processed")
+    Purchase.objects.filter(pk=delivered.pk).update(updated_at=timezone.now() - timedelta(days=120))
+    archive_service.archive_completed()
+    assert not PaymentWebhookEvent.objects.exists()
+
+    client = APIClient(HTTP_HOST=shop.domain)
+    response = client.post(f"/api/purchases/{delivered.pk}/payment_webhook/", {"webhook_data": {"id": "evt-1"}}, format="json")
+    assert response.status_code == 200
+    assert response.json() == {"success": True, "duplicate": True}
+    assert not PaymentWebhookEvent.objects.exists()
+
+@pytest.mark.django_db
+def test_deleting_customer_removes_archived_rows(shop, customer, address, product, payment_setup):
+    delivered = _placed(shop, customer, address, product, "delivered", 0)
+    Payment.objects.create(purchase=delivered, shop_payment_method=payment_setup["shop_payment_method"], status="paid")
+    Purchase.objects.filter(pk=delivered.pk).update(updated_at=timezone.now() - timedelta(days=120))
+    archive_service.archive_completed()
+
+    customer.delete()
+    assert not ArchivedPurchase.objects.exists()
+    assert not ArchivedPurchaseProduct.objects.exists()
+    assert not ArchivedPayment.objects.exists()
@@ -0,0 +1,99 @@
+import asyncio
+import time
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from cart.models import Payment, Purchase, PaymentGateway, PaymentMethod, GatewayPaymentMethod, ShopPaymentMethod, PaymentWebhookEvent
+from cart.services import purchases_service
+
+GATEWAY_DELAY = 0.3
+
+@pytest.fixture
+def stub_payment_method(shop):
+    pg = PaymentGateway.objects.create(name="Stub")
+    pm = PaymentMethod.objects.create(name="Card", type="card")
+    gpm = GatewayPaymentMethod.objects.create(gateway=pg, payment_method=pm)
+    return ShopPaymentMethod.objects.create(shop=shop, gateway_payment_method=gpm, config={"delay": GATEWAY_DELAY})
+
+@pytest.fixture
+def ready_purchases(shop, customer, address, product):
+    purchases = []
+    for _ in range(10):
+        purchase = Purchase.objects.create(shop=shop, customer=customer, address=address, status="draft")
+        purchase.purchase_products.create(product=product, quantity=1, price_at_purchase=product.price)
+        purchase.refresh_from_db()
+        purchases.append(purchase)
+    return purchases
+
+@pytest.mark.django_db
+def test_ainitialize_payment_waits_on_gateways_concurrently(ready_purchases, stub_payment_method):
+    async def checkout_all():
+        return await asyncio.gather(*(
+            purchases_service.ainitialize_payment(purchase, stub_payment_method.id) for purchase in ready_purchases
+        ))
+
+    started = time.monotonic()
+    results = async_to_sync(checkout_all)()
+    elapsed = time.monotonic() - started
+
+    assert all(result["success"] for result in results)
+    assert Payment.objects.filter(status="pending", transaction_reference__startswith="stub_").count() == len(ready_purchases)
+    # sequential gateway calls would take len(ready_purchases) * GATEWAY_DELAY
+    assert elapsed < len(ready_purchases) * GATEWAY_DELAY / 2
+
+@pytest.mark.django_db
+def test_async_endpoints(shop, ready_purchases, stub_payment_method):
+    # the async test client always sends "testserver" as host
+    shop.domain = "testserver"
+    shop.save()
+    client = AsyncClient()
+    purchase = ready_purchases[0]
+
+    async def run():
+        retrieved = await client.get(f"/api/async/purchases/{purchase.id}/")
+        initialized = await client.post(
+            f"/api/async/purchases/{purchase.id}/initialize_payment/",
+            {"shop_payment_method_id": stub_payment_method.id},
+            content_type="application/json",
+        )
+        webhook = await client.post(
+            f"/api/async/purchases/{purchase.id}/payment_webhook/",
+            {"webhook_data": {"event_id": "evt_async"}},
+            content_type="application/json",
+        )
+        return retrieved, initialized, webhook
+
+    retrieved, initialized, webhook = async_to_sync(run)()
+    assert retrieved.status_code == 200
+    assert retrieved.json()["id"] == purchase.id
+    assert initialized.status_code == 200
+    assert webhook.status_code == 202
+    assert PaymentWebhookEvent.objects.filter(dedup_key=f"event:{purchase.id}:evt_async", purchase=purchase).exists()
+
+@pytest.mark.django_db
+def test_async_endpoints_reject_malformed_bodies(shop, ready_purchases, stub_payment_method):
+    shop.domain = "testserver"
+    shop.save()
+    client = AsyncClient()
+    purchase, incomplete = ready_purchases[:2]
+    incomplete.address = None
+    incomplete.save()
+
+    async def run():
+        malformed = await client.post(
+            f"/api/async/purchases/{purchase.id}/payment_webhook/", "{not json", content_type="application/json"
+        )
+        not_an_object = await client.post(
+            f"/api/async/purchases/{purchase.id}/initialize_payment/", "[1]", content_type="application/json"
+        )
+        invalid = await client.post(
+            f"/api/async/purchases/{incomplete.id}/initialize_payment/",
+            {"shop_payment_method_id": stub_payment_method.id},
+            content_type="application/json",
+        )
+        return malformed, not_an_object, invalid
+
+    malformed, not_an_object, invalid = async_to_sync(run)()
+    assert malformed.status_code == not_an_object.status_code == invalid.status_code == 400
+    assert malformed.json() == {"detail": "Request body must be a JSON object."}
+    assert invalid.json() == {"error": "Purchase must have an address before activation."}
@@ -1,7 +1,9 @@
 import pytest
+from django.db import transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from cart.services import coupons_service
+from cart.services import coupons_service, purchases_service
+from cart.models import Purchase, CouponRedemption
 
 @pytest.mark.django_db
 def test_validate_valid_coupon(shop, purchase):
@@ -56,3 +58,80 @@ def test_validate_raises_for_min_cart_value(shop, purchase):
     )
     with pytest.raises(ValidationError):
         coupons_service.validate(purchase, "BIGORDER")
+
+@pytest.mark.django_db
+def test_get_coupon_caches_lookups(shop, django_assert_num_queries):
+    coupon = shop.coupons.create(code="CACHED", discount_type="fixed", discount_value=5, is_active=True)
+    with django_assert_num_queries(2):
+        assert coupons_service.get_coupon(shop, "CACHED").id == coupon.id
+        assert coupons_service.get_coupon(shop, "CACHED").id == coupon.id
+        assert coupons_service.get_coupon(shop, "NOPE") is None
+        assert coupons_service.get_coupon(shop, "NOPE") is None
+
+@pytest.mark.django_db
+def test_coupon_save_invalidates_cache(shop, purchase):
+    coupon = shop.coupons.create(code="FLIP", discount_type="fixed", discount_value=5, is_active=True)
+    assert coupons_service.validate(purchase, "FLIP") is True
+    coupon.is_active = False
+    coupon.save()
+    with pytest.raises(ValidationError):
+        coupons_service.validate(purchase, "FLIP")
+
+@pytest.mark.django_db
+def test_creating_coupon_invalidates_negative_entry(shop):
+    assert coupons_service.get_coupon(shop, "LATER") is None
+    coupon = shop.coupons.create(code="LATER", discount_type="fixed", discount_value=5, is_active=True)
+    assert coupons_service.get_coupon(shop, "LATER").id == coupon.id
+
+@pytest.mark.django_db
+def test_once_per_customer_coupon_is_rejected_after_redemption(shop, customer, address, purchase):
+    coupon = shop.coupons.create(code="ONCE", discount_type="fixed", discount_value=5, once_per_customer=True, is_active=True)
+    purchase.coupon = coupon
+    coupons_service.redeem(purchase)
+
+    second = Purchase.objects.create(shop=shop, customer=customer, address=address, coupon=coupon)
+    with pytest.raises(ValidationError):
+        coupons_service.validate(second, "ONCE")
+    # concurrent checkouts that both passed validation are stopped by the database
+    with pytest.raises(ValidationError), transaction.atomic():
+        coupons_service.redeem(second)
+    assert CouponRedemption.objects.filter(coupon=coupon).count() == 1
+
+@pytest.mark.django_db
+def test_redeem_enforces_usage_limit(shop, customer, address, purchase):
+    coupon = shop.coupons.create(code="LIMITED", discount_type="fixed", discount_value=5, usage_limit=1, is_active=True)
+    purchase.coupon = coupon
+    coupons_service.redeem(purchase)
+
+    second = Purchase.objects.create(shop=shop, customer=customer, address=address, coupon=coupon)
+    with pytest.raises(ValidationError), transaction.atomic():
+        coupons_service.redeem(second)
+    coupon.refresh_from_db()
+    assert coupon.times_used == 1
+
+@pytest.mark.django_db
+def test_redeem_refreshes_cached_usage_count(shop, customer, address, purchase):
+    coupon = shop.coupons.create(code="LAST", discount_type="fixed", discount_value=5, usage_limit=1, is_active=True)
+    assert coupons_service.validate(purchase, "LAST") is True
+    purchase.coupon = coupon
+    coupons_service.redeem(purchase)
+
+    second = Purchase.objects.create(shop=shop, customer=customer, address=address)
+    with pytest.raises(ValidationError, match="usage limit"):
+        coupons_service.validate(second, "LAST")
+
+@pytest.mark.django_db
+def test_cancelling_placed_purchase_releases_redemption(shop, customer, address, purchase):
+    coupon = shop.coupons.create(code="BACK", discount_type="fixed", discount_value=5, usage_limit=1, once_per_customer=True, is_active=True)
+    purchase.coupon = coupon
+    coupons_service.redeem(purchase)
+    purchase.status = "active"
+    purchase.save()
+
+    purchases_service.cancel(purchase)
+    purchases_service.cancel(purchase)
+    coupon.refresh_from_db()
+    assert coupon.times_used == 0
+    assert not CouponRedemption.objects.exists()
+    second = Purchase.objects.create(shop=shop, customer=customer, address=address)
+    assert coupons_service.validate(second, "BACK") is True
@@ -1,6 +1,7 @@
 import pytest
+from rest_framework.test import APIClient
 from cart.services import customers_service
-from cart.models import Customer
+from cart.models import Customer, Shop
 
 @pytest.mark.django_db
 def test_find_or_create_returns_existing_customer(shop, customer):
@@ -15,3 +16,59 @@ def test_find_or_create_creates_new_customer(shop):
     result = customers_service.find_or_create(shop, data)
     assert result.email == "alice@example.com"
     assert Customer.objects.count() == 1
+
+@pytest.mark.django_db
+def test_find_or_create_matches_email_case_insensitively(shop, customer):
+    data = {"name": "John Doe", "email": " John@Example.COM", "phone": "0123456789"}
+    assert customers_service.find_or_create(shop, data).id == customer.id
+    assert Customer.objects.count() == 1
+
+@pytest.mark.django_db
+def test_find_or_create_skips_write_when_unchanged(shop, customer, django_assert_num_queries):
+    data = {"name": "John Doe", "email": "john@example.com", "phone": "0123456789"}
+    with django_assert_num_queries(1):
+        customers_service.find_or_create(shop, data)
+
+@pytest.mark.django_db
+def test_find_or_create_updates_changed_customer(shop, customer):
+    result = customers_service.find_or_create(shop, {"name": "John Doe", "email": "john@example.com", "phone": "111"})
+    assert result.id == customer.id
+    customer.refresh_from_db()
+    assert customer.phone == "111"
+
+@pytest.mark.django_db
+def test_same_email_in_other_shop_is_another_customer(shop, customer):
+    other = Shop.objects.create(name="Other", domain="other.local")
+    result = customers_service.find_or_create(other, {"name": "John", "email": "john@example.com", "phone": "1"})
+    assert result.id != customer.id
+    assert result.shop_id == other.id
+
+@pytest.mark.django_db
+def test_bulk_upsert_counts(shop, customer):
+    counts = customers_service.bulk_upsert(shop, [
+        {"name": "John Doe", "email": "JOHN@example.com", "phone": "0123456789"},
+        {"name": "Alice", "email": "alice@example.com", "phone": "1"},
+        {"name": "Alice B", "email": "Alice@example.com", "phone": "2"},
+        {"name": "Bob", "email": "bob@example.com", "phone": "3"},
+    ], batch_size=2)
+    assert counts == {"created": 2, "updated": 0, "unchanged": 1}
+    assert shop.customers.get(email="alice@example.com").name == "Alice B"
+
+    counts = customers_service.bulk_upsert(shop, [{"name": "Bob", "email": "bob@example.com", "phone": "4"}])
+    assert counts == {"created": 0, "updated": 1, "unchanged": 0}
+    assert shop.customers.count() == 3
+
+@pytest.mark.django_db
+def test_customer_update_normalizes_and_rejects_duplicate_email(shop, customer):
+    other = shop.customers.create(name="Jane", email="jane@example.com", phone="1")
+    client = APIClient(HTTP_HOST=shop.domain)
+
+    response = client.patch(f"/api/customers/{other.id}/", {"email": "John@Example.com"}, format="json")
+    assert response.status_code == 400
+    assert "email" in response.json()
+
+    response = client.patch(f"/api/customers/{other.id}/", {"email": "Mixed@Example.com"}, format="json")
+    assert response.status_code == 200
+    other.refresh_from_db()
+    assert other.email == "mixed@example.com"
+    assert customers_service.find_or_create(shop, {"name": "Jane", "email": "mixed@example.com", "phone": "1"}).id == other.id
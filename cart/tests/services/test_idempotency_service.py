@@ -0,0 +1,72 @@
+import pytest
+from datetime import timedelta
+from unittest.mock import patch
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from cart.models import IdempotencyKey, Purchase, Payment
+from cart.services import idempotency_service
+from cart.services.payments_service.stripe import StripeGateway
+
+@pytest.fixture
+def client(shop):
+    return APIClient(HTTP_HOST=shop.domain)
+
+def post(client, path, data, key):
+    return client.post(path, data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+@pytest.mark.django_db
+def test_retry_replays_first_response(client, shop, product):
+    data = {"product": {"product_id": product.id, "quantity": 1}}
+    first = post(client, "/api/purchases/", data, "key-1")
+    retry = post(client, "/api/purchases/", data, "key-1")
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry["Idempotent-Replayed"] == "true"
+    assert Purchase.objects.filter(shop=shop).count() == 1
+
+    post(client, "/api/purchases/", data, "key-2")
+    assert Purchase.objects.filter(shop=shop).count() == 2
+
+@pytest.mark.django_db
+def test_key_reused_with_other_body_is_rejected(client, product):
+    post(client, "/api/purchases/", {"product": {"product_id": product.id, "quantity": 1}}, "key-1")
+    response = post(client, "/api/purchases/", {"product": {"product_id": product.id, "quantity": 2}}, "key-1")
+    assert response.status_code == 422
+
+@pytest.mark.django_db
+def test_concurrent_duplicate_gets_conflict(client, shop, product):
+    data = {"product": {"product_id": product.id, "quantity": 1}}
+    record, _ = idempotency_service.begin(shop, "key-1", "POST /api/purchases/", JSONRenderer().render(data))
+    response = post(client, "/api/purchases/", data, "key-1")
+    assert response.status_code == 409
+    assert not Purchase.objects.filter(shop=shop).exists()
+
+    # the first request died, once its lock expires a retry runs it
+    IdempotencyKey.objects.filter(pk=record.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+    assert post(client, "/api/purchases/", data, "key-1").status_code == 201
+
+@pytest.mark.django_db
+def test_initialize_payment_retry_calls_gateway_once(client, purchase, product, payment_setup):
+    purchase.purchase_products.create(product=product, quantity=1, price_at_purchase=product.price)
+    path = f"/api/purchases/{purchase.id}/initialize_payment/"
+    data = {"shop_payment_method_id": payment_setup["shop_payment_method"].id}
+
+    with patch.object(StripeGateway, "initialize_payment", return_value="transaction_reference") as gateway_call:
+        first = post(client, path, data, "pay-1")
+        retry = post(client, path, data, "pay-1")
+
+    assert gateway_call.call_count == 1
+    assert retry.json() == first.json()
+    assert Payment.objects.filter(purchase=purchase).count() == 1
+
+@pytest.mark.django_db
+def test_purge_expired(shop):
+    record, _ = idempotency_service.begin(shop, "old", "POST /api/purchases/", b"{}")
+    idempotency_service.complete(record, 201, {"id": 1})
+    idempotency_service.begin(shop, "new", "POST /api/purchases/", b"{}")
+    IdempotencyKey.objects.filter(key="old").update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    assert idempotency_service.purge_expired() == 1
+    assert list(IdempotencyKey.objects.values_list("key", flat=True)) == ["new"]
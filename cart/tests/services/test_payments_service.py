@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import patch
-from cart.models import Payment, Purchase
+from cart.models import Payment, Purchase, PaymentGateway, PaymentMethod, GatewayPaymentMethod, ShopPaymentMethod
 from cart.services.payments_service.loader import get_gateway
 
 @pytest.mark.django_db
@@ -38,3 +38,30 @@ def test_stripe_initialize_payment_uses_gateway_mock(shop, customer, address, pr
 
         payment = Payment.objects.filter(purchase=purchase).first()
         assert payment.transaction_reference == "transaction_reference"
+
+@pytest.mark.django_db
+def test_get_gateway_reuses_configured_instance(payment_setup, django_assert_num_queries):
+    from cart.services.payments_service.stripe import StripeGateway
+
+    spm = ShopPaymentMethod.objects.select_related("gateway_payment_method__gateway").get(pk=payment_setup["shop_payment_method"].pk)
+    gateway = get_gateway(spm)
+    assert isinstance(gateway, StripeGateway)
+    assert gateway.api_key == "sk_test"
+    with django_assert_num_queries(0):
+        assert get_gateway(spm) is gateway
+
+    spm.config = {"api_key": "sk_new"}
+    spm.save()
+    new_gateway = get_gateway(spm)
+    assert new_gateway is not gateway
+    assert new_gateway.api_key == "sk_new"
+
+@pytest.mark.django_db
+def test_get_gateway_resolves_names_with_spaces(shop):
+    from cart.services.payments_service.cash_on_delivery import CashOnDeliveryGateway
+
+    pg = PaymentGateway.objects.create(name="Cash on Delivery")
+    pm = PaymentMethod.objects.create(name="Cash", type="cod")
+    gpm = GatewayPaymentMethod.objects.create(gateway=pg, payment_method=pm)
+    spm = ShopPaymentMethod.objects.create(shop=shop, gateway_payment_method=gpm)
+    assert isinstance(get_gateway(spm), CashOnDeliveryGateway)
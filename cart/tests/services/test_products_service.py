@@ -0,0 +1,27 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from cart.services import products_service
+
+@pytest.mark.django_db
+def test_decrement_stock_updates_all_products(shop, product):
+    other = shop.products.create(name="Product B", sku="SKU-B", price=50, stock=5)
+    with CaptureQueriesContext(connection) as ctx:
+        failed = products_service.decrement_stock({product.id: 4, other.id: 5})
+    assert failed == []
+    # one UPDATE for every line (the rest are savepoint statements)
+    assert len([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]) == 1
+    product.refresh_from_db()
+    other.refresh_from_db()
+    assert product.stock == 6
+    assert other.stock == 0
+
+@pytest.mark.django_db
+def test_decrement_stock_is_all_or_nothing(shop, product):
+    other = shop.products.create(name="Product B", sku="SKU-B", price=50, stock=5)
+    failed = products_service.decrement_stock({product.id: 4, other.id: 6})
+    assert failed == [other.id]
+    product.refresh_from_db()
+    other.refresh_from_db()
+    assert product.stock == 10
+    assert other.stock == 5
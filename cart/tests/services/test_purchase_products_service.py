@@ -52,3 +52,40 @@ def test_delete_one_removes(purchase, product):
     pp = purchase.purchase_products.create(product=product, quantity=1, price_at_purchase=product.price)
     purchase_products_service.delete_one(pp)
     assert not PurchaseProduct.objects.filter(id=pp.id).exists()
+
+@pytest.mark.django_db
+def test_bulk_upsert_adds_and_updates_lines(shop, purchase, product, django_assert_max_num_queries):
+    other = shop.products.create(name="Product B", sku="SKU-B", price=50, stock=5)
+    purchase.purchase_products.create(product=product, quantity=1, price_at_purchase=product.price)
+    data = {
+        "purchase_id": purchase.id,
+        "lines": [
+            {"product_id": product.id, "quantity": 2},
+            {"product_id": other.id, "quantity": 3},
+        ],
+    }
+    with django_assert_max_num_queries(10):
+        purchase, purchase_products, errors = purchase_products_service.bulk_upsert(shop, data)
+
+    assert errors == []
+    assert {pp.product_id: pp.quantity for pp in purchase.purchase_products.all()} == {product.id: 3, other.id: 3}
+    purchase.refresh_from_db()
+    assert float(purchase.total_amount) == 450.0
+
+@pytest.mark.django_db
+def test_bulk_upsert_reports_per_line_errors(shop, purchase, product):
+    other = shop.products.create(name="Product B", sku="SKU-B", price=50, stock=5)
+    data = {
+        "purchase_id": purchase.id,
+        "mode": "set",
+        "lines": [
+            {"product_id": other.id, "quantity": 6},
+            {"product_id": 999999, "quantity": 1},
+            {"product_id": product.id, "quantity": 4},
+        ],
+    }
+    purchase, purchase_products, errors = purchase_products_service.bulk_upsert(shop, data)
+
+    assert [(error["index"], error["product_id"]) for error in errors] == [(0, other.id), (1, 999999)]
+    assert [pp.product_id for pp in purchase_products] == [product.id]
+    assert float(purchase.total_amount) == 400.0
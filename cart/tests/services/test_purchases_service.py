@@ -76,3 +76,47 @@ def test_activate_purchase_decrements_stock_and_sets_active(shop, customer, addr
     
     assert product.stock == product_stock_before - 2
     assert purchase.status == "active"
+
+@pytest.mark.django_db
+def test_activate_reports_lines_without_stock(shop, customer, address, product):
+    other = shop.products.create(name="Product B", sku="SKU-B", price=50, stock=5)
+    purchase = Purchase.objects.create(shop=shop, customer=customer, address=address, status="draft")
+    purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    short_line = purchase.purchase_products.create(product=other, quantity=3, price_at_purchase=other.price)
+    purchase.refresh_from_db()
+
+    # stock sold out by a concurrent checkout after validation
+    with patch("cart.services.purchases_service.validate"):
+        other.stock = 1
+        other.save()
+        with pytest.raises(ValidationError) as exc:
+            purchases_service.activate(purchase)
+
+    assert [e.params["purchase_product_id"] for e in exc.value.error_list] == [short_line.id]
+    product.refresh_from_db()
+    purchase.refresh_from_db()
+    assert product.stock == 10
+    assert purchase.status == "draft"
+
+@pytest.mark.django_db
+def test_delete_abandoned_drafts_removes_stale_drafts_with_lines(shop, customer, address, product):
+    from datetime import timedelta
+    from django.utils import timezone
+    from cart.models import PaymentWebhookEvent
+
+    stale = Purchase.objects.create(shop=shop)
+    stale.purchase_products.create(product=product, quantity=1, price_at_purchase=product.price)
+    paid = Purchase.objects.create(shop=shop)
+    PaymentWebhookEvent.objects.create(purchase=paid, dedup_key="evt-1")
+    active = Purchase.objects.create(shop=shop, customer=customer, address=address, status="active")
+    old = timezone.now() - timedelta(days=30)
+    Purchase.objects.filter(pk__in=[stale.pk, paid.pk, active.pk]).update(updated_at=old)
+    fresh = Purchase.objects.create(shop=shop)
+
+    last_id, deleted = purchases_service.delete_abandoned_drafts(batch_size=10)
+    assert last_id == stale.pk
+    assert deleted["cart.Purchase"] == 1
+    assert deleted["cart.PurchaseProduct"] == 1
+    assert set(Purchase.objects.values_list("pk", flat=True)) == {paid.pk, active.pk, fresh.pk}
+    assert not PurchaseProduct.objects.filter(purchase_id=stale.pk).exists()
+    assert purchases_service.delete_abandoned_drafts(last_id) == (None, {})
@@ -0,0 +1,49 @@
+import pytest
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from cart.services import reservations_service, purchases_service
+from cart.services.products_service import available_stock
+from cart.models import Purchase, StockReservation
+
+@pytest.fixture
+def reserved_purchase(shop, customer, address, product):
+    purchase = Purchase.objects.create(shop=shop, customer=customer, address=address, status="draft")
+    purchase.purchase_products.create(product=product, quantity=6, price_at_purchase=product.price)
+    purchase.refresh_from_db()
+    reservations_service.reserve(purchase)
+    return purchase
+
+@pytest.mark.django_db
+def test_reserve_holds_stock_for_other_purchases(shop, customer, address, product, reserved_purchase):
+    assert available_stock([product.id]) == {product.id: 4}
+    assert available_stock([product.id], exclude_purchase=reserved_purchase) == {product.id: 10}
+
+    other = Purchase.objects.create(shop=shop, customer=customer, address=address, status="draft")
+    other.purchase_products.create(product=product, quantity=5, price_at_purchase=product.price)
+    with pytest.raises(ValidationError):
+        reservations_service.reserve(other)
+
+@pytest.mark.django_db
+def test_expired_holds_are_ignored_and_swept(product, reserved_purchase):
+    StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+    assert available_stock([product.id]) == {product.id: 10}
+    assert reservations_service.release_expired(batch_size=10) == 1
+    assert not StockReservation.objects.exists()
+
+@pytest.mark.django_db
+def test_activate_converts_holds_into_decrements(product, reserved_purchase):
+    purchases_service.activate(reserved_purchase)
+    product.refresh_from_db()
+    assert product.stock == 4
+    assert not StockReservation.objects.filter(purchase=reserved_purchase).exists()
+
+@pytest.mark.django_db
+def test_activate_cannot_take_stock_held_by_another_purchase(shop, customer, address, product, reserved_purchase):
+    other = Purchase.objects.create(shop=shop, customer=customer, address=address, status="draft")
+    other.purchase_products.create(product=product, quantity=5, price_at_purchase=product.price)
+    other.refresh_from_db()
+    with pytest.raises(ValidationError):
+        purchases_service.activate(other)
+    product.refresh_from_db()
+    assert product.stock == 10
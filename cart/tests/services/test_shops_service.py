@@ -0,0 +1,38 @@
+import pytest
+from cart.services import shops_service
+from cart.models import Shop
+
+@pytest.mark.django_db
+def test_get_by_domain_caches_shop(shop, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        first = shops_service.get_by_domain("testshop.local")
+        second = shops_service.get_by_domain("testshop.local")
+    assert first.id == shop.id
+    assert second.id == shop.id
+    assert shops_service.cache_stats()["hits"] == 1
+
+@pytest.mark.django_db
+def test_get_by_domain_caches_unknown_hosts(django_assert_num_queries):
+    with django_assert_num_queries(1):
+        assert shops_service.get_by_domain("unknown.local") is None
+        assert shops_service.get_by_domain("unknown.local") is None
+
+@pytest.mark.django_db
+def test_creating_shop_invalidates_negative_entry():
+    assert shops_service.get_by_domain("new.local") is None
+    shop = Shop.objects.create(name="New", domain="new.local")
+    assert shops_service.get_by_domain("new.local").id == shop.id
+
+@pytest.mark.django_db
+def test_domain_change_invalidates_old_entry(shop):
+    shops_service.get_by_domain("testshop.local")
+    shop.domain = "renamed.local"
+    shop.save()
+    assert shops_service.get_by_domain("testshop.local") is None
+    assert shops_service.get_by_domain("renamed.local").id == shop.id
+
+@pytest.mark.django_db
+def test_deleting_shop_invalidates_entry(shop):
+    shops_service.get_by_domain("testshop.local")
+    shop.delete()
+    assert shops_service.get_by_domain("testshop.local") is None
@@ -0,0 +1,102 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from cart.services import purchases_service, totals_service
+from cart.models import Purchase
+
+def _total_updates(ctx):
+    return [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "cart_purchase" SET "total_amount"')]
+
+@pytest.mark.django_db
+def test_create_recalculates_total_once(shop, product):
+    with CaptureQueriesContext(connection) as ctx:
+        purchase = purchases_service.create(shop, {"product": {"product_id": product.id, "quantity": 2}})
+    assert len(_total_updates(ctx)) == 1
+    assert purchase.total_amount == Decimal("200.00")
+    purchase.refresh_from_db()
+    assert purchase.total_amount == Decimal("200.00")
+
+@pytest.mark.django_db
+def test_apply_coupon_updates_returned_instance(shop, purchase, product):
+    purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    shop.coupons.create(code="HALF", discount_type="percent", discount_value=50, is_active=True)
+    updated = purchases_service.apply_coupon(purchase, "HALF")
+    assert updated.total_amount == Decimal("100.00")
+
+@pytest.mark.django_db
+def test_suppress_totals_skips_recalculation(purchase, product):
+    with totals_service.suppress_totals():
+        purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    purchase.refresh_from_db()
+    assert purchase.total_amount == 0
+
+    totals_service.calculate_total(purchase)
+    assert Purchase.objects.get(pk=purchase.pk).total_amount == Decimal("200.00")
+
+@pytest.mark.django_db
+def test_coalesce_totals_discards_pending_on_error(purchase, product):
+    with pytest.raises(RuntimeError):
+        with totals_service.coalesce_totals():
+            purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+            raise RuntimeError()
+    with CaptureQueriesContext(connection) as ctx:
+        with totals_service.coalesce_totals():
+            pass
+    assert len(ctx.captured_queries) == 0
+
+@pytest.mark.django_db
+def test_line_changes_move_summary_by_delta(purchase, product):
+    line = purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    line = type(line).objects.get(pk=line.pk)
+    line.quantity = 5
+    with CaptureQueriesContext(connection) as ctx:
+        line.save()
+    # no aggregate over the lines, only the delta update
+    assert not [q for q in ctx.captured_queries if "SUM(" in q["sql"]]
+    purchase.refresh_from_db()
+    assert (purchase.subtotal, purchase.item_count, purchase.total_amount) == (Decimal("500.00"), 5, Decimal("500.00"))
+
+    line.delete()
+    purchase.refresh_from_db()
+    assert (purchase.subtotal, purchase.item_count, purchase.total_amount) == (Decimal("0.00"), 0, Decimal("0.00"))
+
+@pytest.mark.django_db
+def test_coupon_discount_follows_subtotal(shop, purchase, product):
+    purchase.purchase_products.create(product=product, quantity=3, price_at_purchase=Decimal("33.33"))
+    shop.coupons.create(code="TEN", discount_type="percent", discount_value=10, is_active=True)
+    purchase = purchases_service.apply_coupon(purchase, "TEN")
+    assert (purchase.discount, purchase.total_amount) == (Decimal("10.00"), Decimal("89.99"))
+    stored = Purchase.objects.get(pk=purchase.pk)
+    assert (stored.subtotal, stored.discount, stored.total_amount) == (Decimal("99.99"), Decimal("10.00"), Decimal("89.99"))
+
+@pytest.mark.django_db
+def test_saving_stale_purchase_keeps_concurrent_line_edits(shop, purchase, product):
+    purchase.purchase_products.create(product=product, quantity=1, price_at_purchase=product.price)
+    stale = Purchase.objects.get(pk=purchase.pk)
+    # another request adds to the cart after this one loaded the purchase
+    purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    shop.coupons.create(code="TEN", discount_type="percent", discount_value=10, is_active=True)
+
+    updated = purchases_service.apply_coupon(stale, "TEN")
+    stored = Purchase.objects.get(pk=purchase.pk)
+    assert (stored.subtotal, stored.item_count, stored.discount, stored.total_amount) == (
+        Decimal("300.00"), 3, Decimal("30.00"), Decimal("270.00")
+    )
+    assert updated.total_amount == Decimal("270.00")
+
+    stale = Purchase.objects.get(pk=purchase.pk)
+    purchase.purchase_products.create(product=product, quantity=1, price_at_purchase=product.price)
+    purchases_service.remove_coupon(stale)
+    stored = Purchase.objects.get(pk=purchase.pk)
+    assert (stored.subtotal, stored.item_count, stored.total_amount) == (Decimal("400.00"), 4, Decimal("400.00"))
+
+@pytest.mark.django_db
+def test_verify_summaries_finds_and_fixes_drift(purchase, product):
+    purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    assert totals_service.verify_summaries() == (purchase.pk, [])
+
+    Purchase.objects.filter(pk=purchase.pk).update(subtotal=1, item_count=7)
+    assert totals_service.verify_summaries(fix=True) == (purchase.pk, [purchase.pk])
+    assert totals_service.verify_summaries() == (purchase.pk, [])
+    assert totals_service.verify_summaries(after_id=purchase.pk) == (None, [])
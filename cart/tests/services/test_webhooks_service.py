@@ -0,0 +1,66 @@
+import pytest
+from cart.services import webhooks_service, purchases_service
+from cart.models import Payment, Purchase, PaymentWebhookEvent
+
+@pytest.fixture
+def pending_purchase(shop, customer, address, product, payment_setup):
+    purchase = Purchase.objects.create(shop=shop, customer=customer, address=address, status="draft")
+    purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    purchase.refresh_from_db()
+    purchases_service.initialize_payment(purchase, payment_setup["shop_payment_method"].id)
+    return purchase
+
+@pytest.mark.django_db
+def test_enqueue_deduplicates_deliveries(pending_purchase):
+    event, duplicate = webhooks_service.enqueue(pending_purchase, {"event_id": "evt_1"})
+    assert not duplicate
+    retry, duplicate = webhooks_service.enqueue(pending_purchase, {"event_id": "evt_1"})
+    assert duplicate
+    assert retry.id == event.id
+
+    # without an event id the transaction reference identifies the delivery
+    _, duplicate = webhooks_service.enqueue(pending_purchase, {})
+    assert not duplicate
+    _, duplicate = webhooks_service.enqueue(pending_purchase, {})
+    assert duplicate
+
+@pytest.mark.django_db
+def test_event_ids_are_scoped_to_the_purchase(shop, pending_purchase):
+    other = Purchase.objects.create(shop=shop)
+    # a webhook for another purchase carrying the same event id does not claim the delivery
+    webhooks_service.enqueue(other, {"event_id": "evt_1"})
+    _, duplicate = webhooks_service.enqueue(pending_purchase, {"event_id": "evt_1"})
+    assert not duplicate
+    assert PaymentWebhookEvent.objects.count() == 2
+
+@pytest.mark.django_db
+def test_process_pending_activates_once(pending_purchase, product):
+    webhooks_service.enqueue(pending_purchase, {"event_id": "evt_1"})
+    webhooks_service.enqueue(pending_purchase, {"event_id": "evt_2"})
+
+    assert webhooks_service.process_pending() == 2
+    assert webhooks_service.process_pending() == 0
+
+    pending_purchase.refresh_from_db()
+    product.refresh_from_db()
+    assert pending_purchase.status == "active"
+    assert product.stock == 8
+    assert Payment.objects.get(purchase=pending_purchase).status == "paid"
+    assert list(PaymentWebhookEvent.objects.order_by("id").values_list("status", flat=True)) == ["processed", "processed"]
+    assert PaymentWebhookEvent.objects.get(dedup_key=f"event:{pending_purchase.id}:evt_2").result == {"success": True, "duplicate": True}
+
+@pytest.mark.django_db
+def test_paid_webhook_for_purchase_that_cannot_activate_needs_review(pending_purchase, product):
+    webhooks_service.enqueue(pending_purchase, {"event_id": "evt_1"})
+    # the stock sold out through another channel after the payment was initialized
+    product.stock = 0
+    product.save()
+
+    assert webhooks_service.process_pending() == 1
+    event = PaymentWebhookEvent.objects.get()
+    assert event.status == "processed"
+    assert event.result["needs_review"]
+    assert Payment.objects.get(purchase=pending_purchase).status == "needs_review"
+    assert Purchase.objects.get(pk=pending_purchase.pk).status == "draft"
+    assert not pending_purchase.stock_reservations.exists()
+    assert webhooks_service.needs_review_count() == 1
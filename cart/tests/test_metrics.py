@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from rest_framework.test import APIClient
+from cart import metrics
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+@pytest.fixture
+def client(shop):
+    return APIClient(HTTP_HOST=shop.domain)
+
+def sample(text, line_start):
+    return [line for line in text.splitlines() if line.startswith(line_start)]
+
+@pytest.mark.django_db
+def test_requests_are_recorded_per_route(client, purchase):
+    client.get("/api/purchases/")
+    client.get(f"/api/purchases/{purchase.id}/")
+    client.get(f"/api/purchases/{purchase.id}/")
+
+    text = APIClient().get("/metrics").content.decode()
+    assert sample(text, 'cart_http_requests_total{route="purchases-detail",method="GET",status="200"} 2')
+    assert sample(text, 'cart_http_request_duration_seconds_count{route="purchases-list",method="GET"} 1')
+    assert sample(text, 'cart_http_request_duration_seconds_bucket{route="purchases-detail",method="GET",le="+Inf"} 2')
+
+    values = metrics.collect()[("purchases-detail", "GET")]
+    assert values["db_queries"] > 0 and values["db_time"] > 0
+    assert values["serialization"] > 0
+
+@pytest.mark.django_db
+def test_metrics_endpoint_is_not_recorded(client):
+    APIClient().get("/metrics")
+    assert metrics.collect() == {}
+
+@pytest.mark.django_db
+def test_worker_files_are_summed(client, purchase, settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    client.get(f"/api/purchases/{purchase.id}/")
+    # another (live) worker process
+    other = metrics._empty()
+    other.update(requests=3, statuses={"200": 3}, db_queries=6)
+    (tmp_path / f"{os.getppid()}.json").write_text(json.dumps([["purchases-detail", "GET", other]]))
+
+    values = metrics.collect()[("purchases-detail", "GET")]
+    assert values["requests"] == 4
+    assert values["statuses"] == {"200": 4}
+
+@pytest.mark.django_db
+def test_files_of_exited_workers_are_removed(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    worker = subprocess.Popen([sys.executable, "-c", ""])
+    worker.wait()
+    stale = tmp_path / f"{worker.pid}.json"
+    stale.write_text(json.dumps([["purchases-detail", "GET", metrics._empty()]]))
+
+    assert metrics.collect() == {}
+    assert not stale.exists()
+    assert [path.name for path in tmp_path.iterdir()] == [f"{os.getpid()}.json"]
+
+@pytest.mark.django_db
+def test_flush_errors_do_not_fail_requests(client, purchase, settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path / "missing")
+    settings.METRICS_FLUSH_INTERVAL = 0
+    assert client.get(f"/api/purchases/{purchase.id}/").status_code == 200
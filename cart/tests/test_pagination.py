@@ -0,0 +1,37 @@
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+from cart.models import Purchase
+
+@pytest.mark.django_db
+def test_purchase_listing_is_cursor_paginated(shop):
+    Purchase.objects.bulk_create([Purchase(shop=shop) for _ in range(5)])
+    client = APIClient(HTTP_HOST=shop.domain)
+
+    first = client.get("/api/purchases/", {"page_size": 2}).json()
+    assert len(first["results"]) == 2
+    assert first["previous"] is None
+
+    seen = [purchase["id"] for purchase in first["results"]]
+    next_url = first["next"]
+    while next_url:
+        page = client.get(next_url).json()
+        seen += [purchase["id"] for purchase in page["results"]]
+        next_url = page["next"]
+
+    assert sorted(seen) == sorted(Purchase.objects.values_list("id", flat=True))
+
+@pytest.mark.django_db
+def test_rows_sharing_a_timestamp_are_paged_once(shop):
+    Purchase.objects.bulk_create([Purchase(shop=shop) for _ in range(5)])
+    Purchase.objects.update(created_at=timezone.now())
+    client = APIClient(HTTP_HOST=shop.domain)
+
+    seen = []
+    next_url = "/api/purchases/?page_size=2"
+    while next_url:
+        page = client.get(next_url).json()
+        seen += [purchase["id"] for purchase in page["results"]]
+        next_url = page["next"]
+
+    assert seen == sorted(Purchase.objects.values_list("id", flat=True), reverse=True)
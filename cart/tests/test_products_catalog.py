@@ -0,0 +1,57 @@
+import pytest
+from rest_framework.test import APIClient
+from cart.models import Purchase, Shop
+from cart.services import purchases_service
+
+@pytest.fixture
+def client(shop):
+    return APIClient(HTTP_HOST=shop.domain)
+
+@pytest.mark.django_db
+def test_catalog_lists_active_products(client, shop, product):
+    shop.products.create(name="Hidden", sku="SKU-H", price=1, stock=1, is_active=False)
+    response = client.get("/api/products/")
+    assert [item["sku"] for item in response.json()["results"]] == ["SKU-A"]
+    assert response["ETag"] and response["Last-Modified"]
+
+@pytest.mark.django_db
+def test_current_client_gets_304_without_queries(client, product, django_assert_num_queries):
+    first = client.get("/api/products/")
+    with django_assert_num_queries(0):
+        response = client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 304
+    with django_assert_num_queries(0):
+        response = client.get("/api/products/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+    assert response.status_code == 304
+
+@pytest.mark.django_db
+def test_repeated_requests_are_served_from_cache(client, product, django_assert_num_queries):
+    first = client.get(f"/api/products/{product.id}/")
+    with django_assert_num_queries(0):
+        again = client.get(f"/api/products/{product.id}/")
+    assert again.json() == first.json() == {"id": product.id, "name": "Product A", "sku": "SKU-A", "price": "100.00", "stock": 10, "is_active": True}
+
+@pytest.mark.django_db
+def test_product_write_changes_etag(client, product):
+    first = client.get("/api/products/")
+    product.price = 120
+    product.save()
+    response = client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert response["ETag"] != first["ETag"]
+    assert response.json()["results"][0]["price"] == "120.00"
+
+@pytest.mark.django_db
+def test_activation_stock_change_changes_etag(client, shop, customer, address, product, django_capture_on_commit_callbacks):
+    purchase = Purchase.objects.create(shop=shop, customer=customer, address=address)
+    purchase.purchase_products.create(product=product, quantity=3, price_at_purchase=product.price)
+    first = client.get("/api/products/")
+    version = Shop.objects.get(pk=shop.pk).catalog_version
+
+    with django_capture_on_commit_callbacks(execute=True):
+        purchases_service.activate(Purchase.objects.get(pk=purchase.pk))
+        # the shop row is not touched inside the checkout transaction
+        assert Shop.objects.get(pk=shop.pk).catalog_version == version
+    response = client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert response.json()["results"][0]["stock"] == 7
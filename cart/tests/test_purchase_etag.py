@@ -0,0 +1,69 @@
+import pytest
+from rest_framework.test import APIClient
+from cart.models import Coupon, Purchase
+from cart.services import customers_service, purchase_products_service, purchases_service
+
+@pytest.fixture
+def client(shop):
+    return APIClient(HTTP_HOST=shop.domain)
+
+@pytest.fixture
+def draft(shop, product):
+    purchase = Purchase.objects.create(shop=shop)
+    purchase_products_service.create({"purchase_id": purchase.id, "product_id": product.id, "quantity": 1})
+    return purchase
+
+@pytest.mark.django_db
+def test_current_etag_costs_one_query(client, draft, django_assert_num_queries):
+    first = client.get(f"/api/purchases/{draft.id}/")
+    assert first.status_code == 200 and first["ETag"]
+    with django_assert_num_queries(1):
+        response = client.get(f"/api/purchases/{draft.id}/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 304
+    assert response["ETag"] == first["ETag"]
+
+@pytest.mark.django_db
+def test_line_change_changes_etag(client, draft, product):
+    first = client.get(f"/api/purchases/{draft.id}/")
+    purchase_products_service.create({"purchase_id": draft.id, "product_id": product.id, "quantity": 2})
+    response = client.get(f"/api/purchases/{draft.id}/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert response["ETag"] != first["ETag"]
+    assert response.json()["total_amount"] != first.json()["total_amount"]
+
+@pytest.mark.django_db
+def test_fields_select_their_own_etag(client, draft):
+    full = client.get(f"/api/purchases/{draft.id}/")
+    sparse = client.get(f"/api/purchases/{draft.id}/?fields=id,total_amount", HTTP_IF_NONE_MATCH=full["ETag"])
+    assert sparse.status_code == 200
+    assert sparse["ETag"] != full["ETag"]
+
+@pytest.mark.django_db
+def test_customer_address_and_coupon_writes_change_etag(client, shop, customer, address, draft):
+    draft.customer, draft.address = customer, address
+    draft.save()
+    coupon = shop.coupons.create(code="TAG", discount_type="fixed", discount_value=5, is_active=True)
+    purchases_service.apply_coupon(Purchase.objects.get(pk=draft.pk), "TAG")
+
+    writes = [
+        lambda: client.patch(f"/api/customers/{customer.id}/", {"name": "Jane Doe"}, format="json"),
+        lambda: client.patch(f"/api/addresses/{address.id}/", {"line1": "9 New St"}, format="json"),
+        lambda: customers_service.bulk_upsert(shop, [{"email": customer.email, "name": "J. Doe", "phone": "1"}]),
+        lambda: Coupon.objects.filter(pk=coupon.pk).first().save(),
+    ]
+    for write in writes:
+        first = client.get(f"/api/purchases/{draft.id}/")
+        write()
+        assert client.get(f"/api/purchases/{draft.id}/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 200
+
+@pytest.mark.django_db
+def test_only_products_in_the_cart_change_etag(client, shop, draft, product):
+    first = client.get(f"/api/purchases/{draft.id}/")
+    shop.products.create(name="Other", sku="SKU-O", price=1, stock=1)
+    assert client.get(f"/api/purchases/{draft.id}/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+
+    product.price = 120
+    product.save()
+    response = client.get(f"/api/purchases/{draft.id}/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert response.json()["products"][0]["product"]["price"] == "120.00"
@@ -0,0 +1,47 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from cart.models import Purchase, Payment
+
+@pytest.fixture
+def client(shop):
+    return APIClient(HTTP_HOST=shop.domain)
+
+def make_purchases(shop, product, payment_setup, count):
+    start = shop.customers.count()
+    for i in range(start, start + count):
+        customer = shop.customers.create(name=f"Customer {i}", email=f"c{i}@example.com", phone="0123456789")
+        address = customer.addresses.create(line1="1 St", city="Cairo", region="Cairo", country="Egypt", postal_code="12345")
+        purchase = Purchase.objects.create(shop=shop, customer=customer, address=address)
+        purchase.purchase_products.create(product=product, quantity=1, price_at_purchase=product.price)
+        Payment.objects.create(purchase=purchase, shop_payment_method=payment_setup["shop_payment_method"])
+
+def count_queries(client, path):
+    client.get(path)  # warm the shop cache
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(path)
+    assert response.status_code == 200
+    return len(ctx.captured_queries)
+
+@pytest.mark.django_db
+def test_purchase_list_queries_do_not_grow_with_rows(client, shop, product, payment_setup):
+    make_purchases(shop, product, payment_setup, 2)
+    few = count_queries(client, "/api/purchases/")
+    make_purchases(shop, product, payment_setup, 10)
+    assert count_queries(client, "/api/purchases/") == few
+
+@pytest.mark.django_db
+def test_customer_list_prefetches_addresses(client, shop, product, payment_setup):
+    make_purchases(shop, product, payment_setup, 2)
+    few = count_queries(client, "/api/customers/")
+    make_purchases(shop, product, payment_setup, 10)
+    assert count_queries(client, "/api/customers/") == few
+
+@pytest.mark.django_db
+def test_planned_list_renders_full_tree(client, shop, product, payment_setup):
+    make_purchases(shop, product, payment_setup, 1)
+    result = client.get("/api/purchases/").json()["results"][0]
+    assert result["customer"]["address"][0]["city"] == "Cairo"
+    assert result["products"][0]["product"]["sku"] == "SKU-A"
+    assert result["payment"][0]["method"] is not None
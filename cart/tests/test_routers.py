@@ -0,0 +1,77 @@
+import time
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.test import RequestFactory
+from cart.middleware import ReplicaRoutingMiddleware
+from cart.models import Purchase
+from cart.routers import ReplicaRouter, reads_from_replicas
+
+# mirror of the test database registered in conftest.py
+REPLICA = "test_replica"
+
+@pytest.fixture
+def replica(settings):
+    settings.READ_REPLICAS = ["replica"]
+    return "replica"
+
+def routed_request(request):
+    """Runs a request through the middleware, returning the response and the alias reads went to."""
+    seen = {}
+    def view(request):
+        seen["db"] = ReplicaRouter().db_for_read(Purchase)
+        return HttpResponse()
+    response = ReplicaRoutingMiddleware(view)(request)
+    return response, seen["db"]
+
+def test_safe_requests_read_from_replicas(replica):
+    response, db = routed_request(RequestFactory().get("/api/purchases/"))
+    assert db == replica
+    assert ReplicaRoutingMiddleware.cookie_name not in response.cookies
+
+def test_writes_pin_client_to_primary(replica):
+    response, db = routed_request(RequestFactory().post("/api/purchases/"))
+    assert db == "default"
+    pinned_until = response.cookies[ReplicaRoutingMiddleware.cookie_name].value
+
+    request = RequestFactory().get("/api/purchases/")
+    request.COOKIES[ReplicaRoutingMiddleware.cookie_name] = pinned_until
+    assert routed_request(request)[1] == "default"
+
+    request.COOKIES[ReplicaRoutingMiddleware.cookie_name] = str(int(time.time()) - 1)
+    assert routed_request(request)[1] == replica
+
+def test_reads_after_write_in_same_request_use_primary(replica):
+    router = ReplicaRouter()
+    with reads_from_replicas():
+        assert router.db_for_read(Purchase) == replica
+        assert router.db_for_write(Purchase) == "default"
+        assert router.db_for_read(Purchase) == "default"
+    assert router.db_for_read(Purchase) == "default"
+
+def test_no_replicas_configured_reads_primary():
+    assert routed_request(RequestFactory().get("/api/purchases/"))[1] == "default"
+
+@pytest.fixture
+def mirrored_replica(settings):
+    settings.READ_REPLICAS = [REPLICA]
+    return REPLICA
+
+@pytest.mark.django_db(transaction=True, databases=["default", REPLICA])
+def test_routed_queries_run_on_their_database(client, shop, mirrored_replica):
+    with CaptureQueriesContext(connections["default"]) as primary, CaptureQueriesContext(connections[REPLICA]) as replica:
+        response = client.get("/api/customers/", HTTP_HOST=shop.domain)
+    assert response.status_code == 200
+    assert replica.captured_queries and not primary.captured_queries
+
+    with CaptureQueriesContext(connections["default"]) as primary, CaptureQueriesContext(connections[REPLICA]) as replica:
+        response = client.post("/api/customers/", {"name": "Jane", "email": "jane@example.com", "phone": "1"}, HTTP_HOST=shop.domain)
+    assert response.status_code == 201
+    assert primary.captured_queries and not replica.captured_queries
+
+    # the client that wrote is pinned and reads its own write from the primary
+    with CaptureQueriesContext(connections["default"]) as primary, CaptureQueriesContext(connections[REPLICA]) as replica:
+        response = client.get("/api/customers/", HTTP_HOST=shop.domain)
+    assert [customer["email"] for customer in response.json()["results"]] == ["jane@example.com"]
+    assert primary.captured_queries and not replica.captured_queries
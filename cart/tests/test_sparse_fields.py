@@ -0,0 +1,40 @@
+import pytest
+from rest_framework.test import APIClient
+from cart.models import Purchase
+
+@pytest.fixture
+def client(shop):
+    return APIClient(HTTP_HOST=shop.domain)
+
+@pytest.fixture
+def full_purchase(purchase, product):
+    purchase.purchase_products.create(product=product, quantity=2, price_at_purchase=product.price)
+    return purchase
+
+@pytest.mark.django_db
+def test_fields_prunes_response_and_queries(client, full_purchase, django_assert_num_queries):
+    client.get("/api/purchases/")  # warm the shop cache
+    with django_assert_num_queries(1):
+        response = client.get("/api/purchases/", {"fields": "id,status,total_amount"})
+    assert response.json()["results"] == [{"id": full_purchase.id, "status": "draft", "total_amount": "200.00"}]
+
+@pytest.mark.django_db
+def test_expand_renders_other_relations_as_ids(client, full_purchase, customer):
+    response = client.get(f"/api/purchases/{full_purchase.id}/", {"expand": "products", "fields": "id,customer,products.quantity,coupon"})
+    assert response.json() == {
+        "id": full_purchase.id,
+        "customer": customer.id,
+        "products": [{"quantity": 2}],
+        "coupon": None,
+    }
+
+@pytest.mark.django_db
+def test_nested_fields_reach_into_relations(client, full_purchase):
+    response = client.get(f"/api/purchases/{full_purchase.id}/", {"fields": "customer.email"})
+    assert response.json() == {"customer": {"email": "john@example.com"}}
+
+@pytest.mark.django_db
+def test_full_tree_by_default(client, full_purchase):
+    response = client.get(f"/api/purchases/{full_purchase.id}/")
+    assert set(response.json()) == {"id", "customer", "total_amount", "status", "products", "coupon", "address", "payment"}
+    assert response.json()["products"][0]["product"]["sku"] == "SKU-A"
@@ -1,13 +1,22 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views.purchases_view import PurchaseViewSet
 from .views.purchase_products_view import PurchaseProductViewSet
 from .views.customers_view import CustomerViewSet
 from .views.addresses_view import AddressViewSet
+from .views.products_view import ProductViewSet
+from .views import async_purchases_view
 
 router = DefaultRouter()
 router.register(r'purchases', PurchaseViewSet, basename='purchases')
 router.register(r'purchase_products', PurchaseProductViewSet, basename='purchase_products')
 router.register(r'customers', CustomerViewSet, basename='customers')
 router.register(r'addresses', AddressViewSet, basename='addresses')
+router.register(r'products', ProductViewSet, basename='products')
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    # async (ASGI) variants of the gateway bound purchase actions
+    path('async/purchases/<int:pk>/', async_purchases_view.retrieve, name='async-purchases-detail'),
+    path('async/purchases/<int:pk>/initialize_payment/', async_purchases_view.initialize_payment, name='async-purchases-initialize-payment'),
+    path('async/purchases/<int:pk>/payment_webhook/', async_purchases_view.payment_webhook, name='async-purchases-payment-webhook'),
+]
@@ -3,13 +3,16 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 
 from cart.models import Address
+from cart.query_planning import QueryPlanningMixin
 from cart.serializers import AddressSerializer, CreateAddressSerializer
 
 from cart.services.addresses_service import (
     create,
+    update,
+    delete,
 )
 
-class AddressViewSet(viewsets.ModelViewSet):
+class AddressViewSet(QueryPlanningMixin, viewsets.ModelViewSet):
     """
     Handles actions on addresses.
     """
@@ -22,7 +25,7 @@ class AddressViewSet(viewsets.ModelViewSet):
             return Address.objects.none()
         
         # Scope to only addresses of customers that belong to current shop
-        return Address.objects.filter(customer__shop=shop)
+        return self.plan_queryset(Address.objects.filter(customer__shop=shop))
 
     def get_serializer_class(self):
         """Dynamically choose serializer depending on the action."""
@@ -37,4 +40,11 @@ class AddressViewSet(viewsets.ModelViewSet):
  
         address = create(serializer.validated_data)
         response_serializer = AddressSerializer(address)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_update(self, serializer):
+        # placed purchases keep the address they were shipped to
+        serializer.instance = update(serializer.instance, serializer.validated_data)
+
+    def perform_destroy(self, instance):
+        delete(instance)
@@ -0,0 +1,82 @@
+# Async (ASGI) variants of the purchase actions that wait on payment gateways.
+# They hold no worker thread while a gateway call is in flight.
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from cart.models import Purchase
+from cart.query_planning import plan_queryset
+from cart.serializers import PurchaseSerializer
+from cart.services import archive_service
+from cart.services.purchases_service import ainitialize_payment
+from cart.services.webhooks_service import aenqueue as aenqueue_webhook
+from cart.views.idempotency import aidempotent
+from django.core.exceptions import ValidationError
+
+
+async def _get_purchase(request, pk, **filters):
+    shop = getattr(request, "shop", None)
+    return await (
+        Purchase.objects.filter(shop=shop, pk=pk, **filters)
+        .select_related("shop", "customer", "coupon", "address")
+        .afirst()
+    )
+
+def _not_found():
+    return JsonResponse({"detail": "Not found."}, status=404)
+
+def _bad_request():
+    return JsonResponse({"detail": "Request body must be a JSON object."}, status=400)
+
+def _request_data(request):
+    """The parsed JSON object body, None when the body is not one."""
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+@require_GET
+async def retrieve(request, pk):
+    """Retrieves a draft purchase."""
+    queryset = Purchase.objects.filter(shop=getattr(request, "shop", None), pk=pk, status="draft")
+    purchase = await plan_queryset(queryset, PurchaseSerializer()).afirst()
+    if purchase is None:
+        return _not_found()
+    data = await sync_to_async(lambda: PurchaseSerializer(purchase).data)()
+    return JsonResponse(data)
+
+@csrf_exempt
+@require_POST
+@aidempotent
+async def initialize_payment(request, pk):
+    """Initiate payment for this purchase."""
+    purchase = await _get_purchase(request, pk, status="draft")
+    if purchase is None:
+        return _not_found()
+    data = _request_data(request)
+    if data is None:
+        return _bad_request()
+    try:
+        payment_result = await ainitialize_payment(purchase, data.get("shop_payment_method_id"))
+    except ValidationError as e:
+        return JsonResponse({"error": "; ".join(e.messages)}, status=400)
+    return JsonResponse(payment_result)
+
+@csrf_exempt
+@require_POST
+async def payment_webhook(request, pk):
+    """Store payment gateway webhook for this purchase, it is processed by the process_payment_webhooks worker."""
+    purchase = await _get_purchase(request, pk)
+    if purchase is None:
+        late = await sync_to_async(archive_service.late_webhook)(getattr(request, "shop", None), pk)
+        return _not_found() if late is None else JsonResponse(late)
+    data = _request_data(request)
+    if data is None:
+        return _bad_request()
+    event, duplicate = await aenqueue_webhook(purchase, data.get("webhook_data", {}))
+    return JsonResponse({"success": True, "event_id": event.id, "duplicate": duplicate}, status=202)
@@ -0,0 +1,19 @@
+# Conditional GET helpers shared by the cached read endpoints.
+
+import hashlib
+
+from django.utils.http import parse_etags, parse_http_date_safe, quote_etag
+
+
+def make_etag(request, *version):
+    """ETag of one representation: the version parts plus the path, whose query string selects the fields."""
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()[:12]
+    return quote_etag("-".join(str(part) for part in (*version, path)))
+
+def is_current(request, etag, last_modified=None):
+    """Whether the client's If-None-Match (or, without it, If-Modified-Since) matches the current version."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        return if_none_match.strip() == "*" or etag in parse_etags(if_none_match)
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return last_modified is not None and if_modified_since is not None and int(last_modified.timestamp()) <= if_modified_since
@@ -3,13 +3,14 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 
 from cart.models import Customer
+from cart.query_planning import QueryPlanningMixin
 from cart.serializers import CustomerSerializer, CreateCustomerSerializer
 
 from cart.services.customers_service import (
     find_or_create,
 )
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(QueryPlanningMixin, viewsets.ModelViewSet):
     """
     Handles actions on customers.
     """
@@ -22,7 +23,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
             return Customer.objects.none()
         
         # Scope to only customers that belong to this shop
-        return Customer.objects.filter(shop=shop)
+        return self.plan_queryset(Customer.objects.filter(shop=shop))
 
     def get_serializer_class(self):
         """Dynamically choose serializer depending on the action."""
@@ -0,0 +1,70 @@
+# Idempotency-Key support for mutating endpoints: the first response per (shop, key, endpoint)
+# is stored and replayed for retries, concurrent duplicates get a 409 while it runs.
+
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+from cart.services.idempotency_service import begin, complete, release
+from django.core.exceptions import ValidationError
+
+ERROR_STATUSES = {"in_progress": status.HTTP_409_CONFLICT, "mismatch": status.HTTP_422_UNPROCESSABLE_ENTITY}
+
+
+def _claim(request):
+    """Returns (record, replay, error) for the request's Idempotency-Key, all None without a key."""
+    key = request.headers.get("Idempotency-Key")
+    shop = getattr(request, "shop", None)
+    if not key or shop is None:
+        return None, None, None
+    try:
+        record, replay = begin(shop, key, f"{request.method} {request.path}", request.body)
+    except ValidationError as e:
+        return None, None, (e.messages[0], ERROR_STATUSES[e.code])
+    return record, replay, None
+
+def idempotent(view):
+    """Decorator for viewset actions."""
+    @functools.wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        record, replay, error = _claim(request)
+        if error:
+            return Response({"error": error[0]}, status=error[1])
+        if replay:
+            return Response(replay.response_body, status=replay.response_status, headers={"Idempotent-Replayed": "true"})
+        if record is None:
+            return view(self, request, *args, **kwargs)
+
+        try:
+            response = view(self, request, *args, **kwargs)
+        except BaseException:
+            release(record)
+            raise
+        complete(record, response.status_code, response.data)
+        return response
+    return wrapper
+
+def aidempotent(view):
+    """Decorator for the async JSON views."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        record, replay, error = await sync_to_async(_claim)(request)
+        if error:
+            return JsonResponse({"error": error[0]}, status=error[1])
+        if replay:
+            return JsonResponse(replay.response_body, status=replay.response_status, safe=False, headers={"Idempotent-Replayed": "true"})
+        if record is None:
+            return await view(request, *args, **kwargs)
+
+        try:
+            response = await view(request, *args, **kwargs)
+        except BaseException:
+            await sync_to_async(release)(record)
+            raise
+        await sync_to_async(complete)(record, response.status_code, json.loads(response.content))
+        return response
+    return wrapper
@@ -0,0 +1,11 @@
+# Prometheus scrape endpoint for the per route metrics collected by MetricsMiddleware.
+
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from cart.metrics import render
+
+
+@require_GET
+def metrics(request):
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
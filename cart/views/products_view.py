@@ -0,0 +1,47 @@
+from rest_framework import viewsets, status
+from rest_framework.response import Response
+from django.utils.http import http_date
+
+from cart.models import Product
+from cart.query_planning import QueryPlanningMixin
+from cart.serializers import ProductSerializer
+from cart.services import catalog_service
+from cart.views.conditional import make_etag, is_current
+
+class ProductViewSet(QueryPlanningMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Storefront catalog of the current shop's active products.
+    Responses are cached per shop catalog version and carry ETag/Last-Modified,
+    clients sending them back get a 304 without a database query.
+    """
+
+    serializer_class = ProductSerializer
+
+    def get_queryset(self):
+        shop = getattr(self.request, "shop", None)
+        if not shop:
+            return Product.objects.none()
+        return self.plan_queryset(Product.objects.filter(shop=shop, is_active=True))
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(request, lambda: super(ProductViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(request, lambda: super(ProductViewSet, self).retrieve(request, *args, **kwargs))
+
+    def cached(self, request, respond):
+        shop = request.shop
+        version, last_modified = catalog_service.get_version(shop)
+        etag = make_etag(request, shop.pk, version)
+        headers = {"ETag": etag, "Last-Modified": http_date(last_modified.timestamp()), "Cache-Control": "no-cache"}
+        if is_current(request, etag, last_modified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        def build():
+            response = respond()
+            return response.status_code, response.data
+
+        response_status, data = catalog_service.get_or_build(shop, version, request.get_full_path(), build)
+        if response_status != status.HTTP_200_OK:
+            return Response(data, status=response_status)
+        return Response(data, headers=headers)
@@ -5,19 +5,23 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 
 from cart.models import PurchaseProduct
+from cart.query_planning import QueryPlanningMixin
 from cart.serializers import (
     PurchaseProductSerializer,
     UpdatePurchaseProductSerializer,
     CreatePurchaseProductSerializer,
+    BulkPurchaseProductSerializer,
 )
 from cart.services.purchase_products_service import (
     create,
     update_one,
-    delete_one
+    delete_one,
+    bulk_upsert,
 )
+from cart.models import Purchase
 from django.core.exceptions import ValidationError
 
-class PurchaseProductViewSet(viewsets.ModelViewSet):
+class PurchaseProductViewSet(QueryPlanningMixin, viewsets.ModelViewSet):
     """
     Handles actions on purchase products.
     """
@@ -30,7 +34,7 @@ class PurchaseProductViewSet(viewsets.ModelViewSet):
             return PurchaseProduct.objects.none()
         
         # Scope to only products that belong to this shop
-        return PurchaseProduct.objects.filter(product__shop=shop)
+        return self.plan_queryset(PurchaseProduct.objects.filter(product__shop=shop))
 
     def get_serializer_class(self):
         """Dynamically choose serializer depending on the action."""
@@ -38,6 +42,8 @@ class PurchaseProductViewSet(viewsets.ModelViewSet):
             return CreatePurchaseProductSerializer
         elif self.action == "update":
             return UpdatePurchaseProductSerializer
+        elif self.action == "bulk":
+            return BulkPurchaseProductSerializer
         return PurchaseProductSerializer
 
     def create(self, request, *args, **kwargs):
@@ -70,4 +76,25 @@ class PurchaseProductViewSet(viewsets.ModelViewSet):
             delete_one(purchase_product)
         except ValidationError as e:
             return Response({"error": e.message}, status=status.HTTP_400_BAD_REQUEST)
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Adds or updates many purchase products in one request and reports per-line errors."""
+        shop = getattr(request, "shop", None)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            purchase, purchase_products, errors = bulk_upsert(shop, serializer.validated_data)
+        except Purchase.DoesNotExist:
+            return Response({"error": "Purchase not found."}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({"error": e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = {
+            "total_amount": str(purchase.total_amount),
+            "products": PurchaseProductSerializer(purchase_products, many=True).data,
+            "errors": errors,
+        }
+        response_status = status.HTTP_400_BAD_REQUEST if errors and not purchase_products else status.HTTP_200_OK
+        return Response(response_data, status=response_status)
@@ -3,6 +3,9 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 
 from cart.models import Purchase
+from cart.query_planning import QueryPlanningMixin
+from cart.views.conditional import make_etag, is_current
+from cart.views.idempotency import idempotent
 from cart.serializers import (
     PurchaseSerializer,
     CreatePurchaseSerializer,
@@ -14,12 +17,15 @@ from cart.services.purchases_service import (
     apply_coupon,
     remove_coupon,
     initialize_payment,
-    handle_payment_webhook,
     activate
 )
+from cart.services.webhooks_service import enqueue as enqueue_webhook
+from cart.services import archive_service
+from django.db.models import Max
+from django.http import Http404
 from django.core.exceptions import ValidationError
 
-class PurchaseViewSet(viewsets.ModelViewSet):
+class PurchaseViewSet(QueryPlanningMixin, viewsets.ModelViewSet):
     """
     Handles listing, retrieving, creating, updating, and special actions on purchases.
     Automatically scoped to the current shop (from middleware).
@@ -31,9 +37,49 @@ class PurchaseViewSet(viewsets.ModelViewSet):
         shop = getattr(self.request, "shop", None)
         if not shop:
             return Purchase.objects.none()
-        return (
-            Purchase.objects.filter(shop=shop, status="draft").select_related('customer', 'coupon', 'address').prefetch_related('purchase_products')
+        if self.action == "payment_webhook":
+            # retries can arrive after the purchase was activated
+            return Purchase.objects.filter(shop=shop)
+
+        queryset = Purchase.objects.filter(shop=shop, status="draft")
+        if self.action not in ("list", "retrieve"):
+            return queryset.select_related('customer', 'coupon', 'address').prefetch_related('purchase_products')
+        # joins, prefetches and columns follow what ?fields= / ?expand= leave in the response
+        return self.plan_queryset(queryset)
+
+    def etag(self, request):
+        """
+        ETag of the draft from one indexed lookup: its updated_at, which customer, address, coupon,
+        line and payment writes bump, and the newest change to the products in it (price, stock).
+        None when the draft does not exist.
+        """
+        version = (
+            Purchase.objects.filter(shop=request.shop, status="draft", pk=self.kwargs["pk"])
+            .annotate(products_updated_at=Max("purchase_products__product__updated_at"))
+            .values_list("updated_at", "products_updated_at")
+            .first()
         )
+        if version is None:
+            return None
+        updated_at, products_updated_at = version
+        return make_etag(request, self.kwargs["pk"], updated_at.timestamp(), products_updated_at and products_updated_at.timestamp())
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieves a draft purchase, a client polling with a current ETag gets a 304."""
+        # read before the object graph: a write in between only makes the tag older than the body
+        etag = self.etag(request) if getattr(request, "shop", None) else None
+        if etag and is_current(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        purchase = self.get_object()
+        response = Response(self.get_serializer(purchase).data)
+        if etag:
+            response["ETag"] = etag
+        return response
+
+    def render(self, purchase):
+        """Serializes a purchase returned by a service, re-read with a planned queryset."""
+        return PurchaseSerializer(self.planned_instance(purchase, PurchaseSerializer())).data
 
     def get_serializer_class(self):
         """Dynamically choose serializer depending on the action."""
@@ -43,6 +89,7 @@ class PurchaseViewSet(viewsets.ModelViewSet):
             return UpdatePurchaseSerializer
         return PurchaseSerializer
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Creates a new purchase for the current shop."""
         shop = getattr(request, "shop", None)
@@ -50,8 +97,7 @@ class PurchaseViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
 
         purchase = create(shop, serializer.validated_data)
-        response_serializer = PurchaseSerializer(purchase)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        return Response(self.render(purchase), status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         """Updates purchase details — like customer, address, and status."""
@@ -60,8 +106,7 @@ class PurchaseViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
 
         updated_purchase = update_one(purchase, serializer.validated_data)
-        response_serializer = PurchaseSerializer(updated_purchase)
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
+        return Response(self.render(updated_purchase), status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
     def apply_coupon(self, request, pk=None):
@@ -72,18 +117,17 @@ class PurchaseViewSet(viewsets.ModelViewSet):
             updated_purchase = apply_coupon(purchase, coupon_code)
         except ValidationError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        response_serializer = PurchaseSerializer(updated_purchase)
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
+        return Response(self.render(updated_purchase), status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
     def remove_coupon(self, request, pk=None):
         """Removes a coupon from the purchase."""
         purchase = self.get_object()
         updated_purchase = remove_coupon(purchase)
-        response_serializer = PurchaseSerializer(updated_purchase)
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
+        return Response(self.render(updated_purchase), status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
+    @idempotent
     def initialize_payment(self, request, pk=None):
         """Initiate payment for this purchase."""
         purchase = self.get_object()
@@ -94,18 +138,32 @@ class PurchaseViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"])
     def payment_webhook(self, request, pk=None):
-        """Handle payment gateway webhook for this purchase."""
-        purchase = self.get_object()
+        """Store payment gateway webhook for this purchase, it is processed by the process_payment_webhooks worker."""
+        try:
+            purchase = self.get_object()
+        except Http404:
+            late = archive_service.late_webhook(getattr(request, "shop", None), pk)
+            if late is None:
+                raise
+            return Response(late, status=status.HTTP_200_OK)
         webhook_data = request.data.get("webhook_data", {})
 
-        webhook_result = handle_payment_webhook(purchase, webhook_data)
-        return Response(webhook_result, status=status.HTTP_200_OK)
+        event, duplicate = enqueue_webhook(purchase, webhook_data)
+        return Response({"success": True, "event_id": event.id, "duplicate": duplicate}, status=status.HTTP_202_ACCEPTED)
     
+    @action(detail=True, methods=["get"])
+    def receipt(self, request, pk=None):
+        """Retrieves a placed purchase, read from the archive once it was moved there."""
+        purchase = archive_service.find(getattr(request, "shop", None), pk)
+        if purchase is None:
+            raise Http404
+        return Response(PurchaseSerializer(purchase, context=self.get_serializer_context()).data)
+
     @action(detail=True, methods=["post"])
+    @idempotent
     def activate(self, request, pk=None):
         """Handle activation of this purchase."""
         purchase = self.get_object()
 
         active_purchase = activate(purchase)
-        response_serializer = PurchaseSerializer(active_purchase)
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(self.render(active_purchase), status=status.HTTP_200_OK)
\ No newline at end of file
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cart.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'cart.middleware.ReplicaRoutingMiddleware',
     'cart.middleware.CurrentShopMiddleware',
 ]
 
@@ -90,6 +92,24 @@ DATABASES = {
     }
 }
 
+# Read replicas (comma separated hosts, same credentials as the primary).
+# Safe requests read from them through cart.routers.ReplicaRouter, tests mirror them to the primary.
+for index, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+
+READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['cart.routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write, so it reads its own writes
+REPLICA_STICKINESS_SECONDS = 10
+
+
+
+REST_FRAMEWORK = {
+    # keyset pagination on created_at for every listing
+    'DEFAULT_PAGINATION_CLASS': 'cart.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': 50,
+}
 
 
 # Password validation
@@ -132,3 +152,59 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Domain -> Shop cache used by CurrentShopMiddleware
+
+SHOP_CACHE_TTL = 300
+SHOP_CACHE_MAX_SIZE = 1024
+SHOP_NEGATIVE_CACHE_TTL = 30
+
+
+# Product catalog responses cached per shop catalog version. Other worker processes see
+# a version bump after at most CATALOG_VERSION_TTL seconds.
+
+CATALOG_CACHE_TTL = 300
+CATALOG_CACHE_MAX_SIZE = 2048
+CATALOG_VERSION_TTL = 5
+
+
+# Seconds stock stays on hold between initialize_payment and the payment webhook
+
+STOCK_RESERVATION_TTL = 15 * 60
+
+
+# Draft purchases untouched for this many seconds are deleted by delete_abandoned_drafts
+
+DRAFT_PURCHASE_TTL = 7 * 24 * 60 * 60
+
+
+# Delivered and cancelled purchases not updated for this many seconds are moved to the archive tables by archive_purchases
+
+PURCHASE_ARCHIVE_AFTER = 90 * 24 * 60 * 60
+
+
+# (shop, code) -> Coupon cache used when applying and validating coupons
+
+COUPON_CACHE_TTL = 60
+COUPON_CACHE_MAX_SIZE = 10000
+COUPON_NEGATIVE_CACHE_TTL = 30
+
+
+# Stored payment webhooks are retried by the worker up to this many times
+
+PAYMENT_WEBHOOK_MAX_ATTEMPTS = 5
+
+
+# Idempotency-Key: responses are replayed for this many seconds, a request still running
+# after IDEMPOTENCY_LOCK_TIMEOUT seconds is considered dead and its key can be retried
+
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+
+# Per route request metrics served at /metrics (Prometheus text format).
+# Multi-process deployments set METRICS_DIR so every worker writes its aggregates there to be summed.
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from cart.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('cart.urls')), 
+    path('metrics', metrics_view.metrics, name='metrics'),
 ]